@@ -14,4 +14,26 @@ def MailFunction(settings, email, otp_code) :
         print("EMAIL SENT!")
     except Exception as e:
         print(f"EMAIL ERROR: {e}")
-        pass
\ No newline at end of file
+        pass
+
+
+def OrderConfirmationMail(settings, email, name, order) :
+    # Raises on failure so the outbox can retry it.
+    lines = [
+        f"- {item.get('name') or item.get('product_id')} x {item.get('quantity', 1)}: Rs. {item.get('total', 0):.2f}"
+        for item in order.get("order_items", [])
+    ]
+    send_mail(
+        f"Order {order['order_id']} placed",
+        f"Hi {name or 'there'},\n\n"
+        f"Thank you for your order {order['order_id']}.\n\n"
+        + "\n".join(lines)
+        + f"\n\nShipping: Rs. {order.get('shipping_fee', 0):.2f}"
+        f"\nCoins used: {order.get('coins_used', 0)} (Rs. {order.get('coin_discount_value', 0):.2f})"
+        f"\nTotal to pay: Rs. {order.get('cash_paid', 0):.2f}"
+        f"\nPoints earned: {order.get('earned_points', 0)}\n",
+        settings.DEFAULT_FROM_EMAIL,
+        [email],
+        fail_silently=False,
+    )
+    print(f"ORDER EMAIL SENT! {order['order_id']}")
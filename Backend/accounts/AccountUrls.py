@@ -10,6 +10,9 @@ urlpatterns = [
     path('auth/login/', viewsAdmin.LoginView.as_view(), name='login'),
     path('auth/me/', viewsAdmin.MeView.as_view(), name='me'),
 
+    # Metrics
+    path('metrics/', viewsAdmin.MetricsView.as_view(), name='metrics'),
+
     # Dashboard
     path('dashboard/', viewsAdmin.DashboardView.as_view(), name='dashboard'),
 
@@ -24,6 +27,8 @@ urlpatterns = [
 
     # Orders
     path('orders/', viewsAdmin.OrderListCreateView.as_view(), name='order-list-create'),
+    path('orders/bulk-status/', viewsAdmin.OrderBulkStatusView.as_view(), name='order-bulk-status'),
+    path('orders/what-if/', viewsAdmin.OrderWhatIfView.as_view(), name='order-what-if'),
     path('orders/<str:pk>/', viewsAdmin.OrderDetailView.as_view(), name='order-detail'),
     path('orders/<str:pk>/status/', viewsAdmin.OrderStatusView.as_view(), name='order-status'),
 
@@ -1,9 +1,21 @@
+from collections import namedtuple
 from datetime import datetime
+import logging
 import math
-import uuid
 from bson import ObjectId
+from django.conf import settings
+from pymongo import ReturnDocument
 
-from utils.jwt_helper import decode_token
+from accounts.admin_search import search_fields
+from accounts.catalog import catalog
+from accounts.idempotency import IdempotencyError
+from accounts.leaderboard import leaderboard
+from accounts.order_ids import new_order_id
+from accounts.outbox import credit_points, order_side_effects, outbox
+from utils.quote_token import verify_quote_token
+
+
+logger = logging.getLogger(__name__)
 
 
 SHIPPING_THRESHOLD = 1000.0
@@ -12,6 +24,12 @@ COIN_PERCENT = 0.04
 COIN_VALUE = 0.2
 EARN_PERCENT = 0.04
 
+PricingParams = namedtuple(
+    "PricingParams",
+    ["shipping_threshold", "shipping_fee", "coin_percent", "coin_value", "earn_percent"],
+)
+DEFAULT_PRICING = PricingParams(SHIPPING_THRESHOLD, SHIPPING_FEE, COIN_PERCENT, COIN_VALUE, EARN_PERCENT)
+
 
 def _to_float(value, fallback=0.0):
     try:
@@ -27,7 +45,30 @@ def _to_int(value, fallback=0):
         return fallback
 
 
-def calculate_order_quote(items, user_points, use_coins=False):
+def _item_product_id(item):
+    return str(item.get("productId") or item.get("product_id") or "")
+
+
+def _unit_price(product, flavor, weight):
+    """Catalog price for a product, preferring a matching flavor/weight variant."""
+    for variant in product.get("variants") or []:
+        if not isinstance(variant, dict) or "price" not in variant:
+            continue
+        if variant.get("weight", weight) == weight and variant.get("flavor", flavor) == flavor:
+            return _to_float(variant.get("price"), None)
+    return _to_float(product.get("price"), None)
+
+
+def resolve_cart_products(items):
+    """Catalog products for every item in a cart, resolved in one batch."""
+    return catalog.resolve(_item_product_id(item) for item in items or [])
+
+
+def calculate_order_quote(items, user_points, use_coins=False, products=None, params=None):
+    """Price a cart; with `products` (see resolve_cart_products) prices come
+    from the catalog and the item's own `price` is ignored. `params` swaps in
+    other PricingParams for what-if runs."""
+    params = params or DEFAULT_PRICING
     if not items:
         raise ValueError("No items in order")
 
@@ -35,35 +76,50 @@ def calculate_order_quote(items, user_points, use_coins=False):
     actual_subtotal = 0.0
 
     for item in items:
-        price = _to_float(item.get("price"))
+        product_id = _item_product_id(item)
+        flavor = item.get("selectedFlavor") or item.get("flavor") or "N/A"
+        weight = item.get("selectedWeight") or item.get("weight") or "N/A"
+        name = item.get("name", "")
+
+        if products is None:
+            price = _to_float(item.get("price"))
+        else:
+            product = products.get(product_id)
+            if not product:
+                raise ValueError(f"Product not found: {product_id}")
+            price = _unit_price(product, flavor, weight)
+            if price is None:
+                raise ValueError(f"Product has no price: {product_id}")
+            name = product.get("name", name)
+
         quantity = max(1, _to_int(item.get("quantity"), 1))
         line_total = round(price * quantity, 2)
         actual_subtotal += line_total
 
         normalized_items.append(
             {
-                "product_id": str(item.get("productId") or item.get("product_id") or ""),
-                "name": item.get("name", ""),
+                "product_id": product_id,
+                "name": name,
                 "price": round(price, 2),
                 "quantity": quantity,
                 "total": line_total,
-                "flavor": item.get("selectedFlavor") or item.get("flavor") or "N/A",
-                "weight": item.get("selectedWeight") or item.get("weight") or "N/A",
+                "flavor": flavor,
+                "weight": weight,
             }
         )
 
     actual_subtotal = round(actual_subtotal, 2)
-    shipping_fee = 0.0 if actual_subtotal >= SHIPPING_THRESHOLD else SHIPPING_FEE
+    shipping_fee = 0.0 if actual_subtotal >= params.shipping_threshold else params.shipping_fee
     cart_total = round(actual_subtotal + shipping_fee, 2)
 
-    max_coin_discount_value = round(cart_total * COIN_PERCENT, 2)
-    max_coins_allowed = math.floor(max_coin_discount_value / COIN_VALUE)
+    max_coin_discount_value = round(cart_total * params.coin_percent, 2)
+    max_coins_allowed = math.floor(max_coin_discount_value / params.coin_value)
 
     coins_used = min(max(user_points, 0), max_coins_allowed) if use_coins else 0
-    coin_discount_value = round(coins_used * COIN_VALUE, 2)
+    coin_discount_value = round(coins_used * params.coin_value, 2)
     final_total = round(max(cart_total - coin_discount_value, 0.0), 2)
 
-    earned_points = math.floor((actual_subtotal * EARN_PERCENT) / COIN_VALUE)
+    earned_points = math.floor((actual_subtotal * params.earn_percent) / params.coin_value)
 
     return {
         "items_subtotal": actual_subtotal,
@@ -72,8 +128,8 @@ def calculate_order_quote(items, user_points, use_coins=False):
         "cart_total": cart_total,
         "max_coins_allowed": max_coins_allowed,
         "coins_used": coins_used,
-        "coin_value": COIN_VALUE,
-        "coin_percent": COIN_PERCENT,
+        "coin_value": params.coin_value,
+        "coin_percent": params.coin_percent,
         "coin_discount_value": coin_discount_value,
         "final_total": final_total,
         "earned_points": earned_points,
@@ -81,68 +137,146 @@ def calculate_order_quote(items, user_points, use_coins=False):
     }
 
 
-def get_user_id_from_auth(auth_header):
-    token = auth_header.split(" ")[1]
-    payload = decode_token(token)
-    return payload["user_id"]
+def _settle_points(users_collection, user_id, coins_used, earned_points, session=None):
+    """Spend and earn in one atomic $inc; returns the new balance."""
+    query = {"_id": ObjectId(user_id)}
+    if coins_used > 0:
+        query["points"] = {"$gte": coins_used}
+    updated = users_collection.find_one_and_update(
+        query,
+        {"$inc": {"points": earned_points - coins_used}},
+        projection={"points": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if not updated:
+        # Only the failure path pays for telling the two causes apart.
+        if coins_used > 0 and users_collection.count_documents(
+            {"_id": ObjectId(user_id)}, limit=1, session=session,
+        ):
+            raise ValueError("Insufficient coins balance")
+        raise ValueError("User not found")
+    return updated.get("points", 0)
+
+
+def place_order(users_collection, orders_collection, user_id, order_doc,
+                coins_used, earned_points, fallback_points=0):
+    """Write the netted points change and the order; returns the new balance.
 
+    Two round trips: one find_one_and_update carrying both the coin spend and
+    the earned points, then the order insert. With ORDER_USE_TRANSACTIONS
+    (replica sets only) both run in one multi-document transaction; otherwise
+    a failed insert is compensated by reversing the points change.
+    """
+    if coins_used == 0 and earned_points == 0:
+        orders_collection.insert_one(order_doc)
+        return fallback_points
 
-def CreateOrderUser(auth_header, data, users_collection, orders_collection):
+    if getattr(settings, "ORDER_USE_TRANSACTIONS", False):
+        def _in_transaction(session):
+            points = _settle_points(users_collection, user_id, coins_used, earned_points, session)
+            orders_collection.insert_one(order_doc, session=session)
+            return points
+
+        with users_collection.database.client.start_session() as session:
+            return session.with_transaction(_in_transaction)
+
+    final_points = _settle_points(users_collection, user_id, coins_used, earned_points)
+    try:
+        orders_collection.insert_one(order_doc)
+    except Exception:
+        users_collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {"points": coins_used - earned_points}},
+        )
+        raise
+    return final_points
+
+
+def CreateOrderUser(identity, data, users_collection, orders_collection, before_place=None, on_placed=None):
     try:
-        user_id = get_user_id_from_auth(auth_header)
+        user_id = identity.user_id
 
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
-        if not user:
-            raise ValueError("User not found")
+        name = None
+        quote_token = data.get("quote_token")
+        if quote_token:
+            # Already priced by order_quote; coins are re-checked by the $gte guard,
+            # and a missing user fails the points update below.
+            quote, name = verify_quote_token(quote_token, user_id)
+        else:
+            user = identity.user
+            if not user:
+                raise ValueError("User not found")
+            name = user.get("name")
 
-        items = data.get("items", [])
-        use_coins = bool(data.get("use_coins", False))
+            items = data.get("items", [])
+            use_coins = bool(data.get("use_coins", False))
 
-        quote = calculate_order_quote(items, user.get("points", 0), use_coins=use_coins)
+            quote = calculate_order_quote(
+                items, user.get("points", 0), use_coins=use_coins,
+                products=resolve_cart_products(items),
+            )
         coins_used = quote["coins_used"]
         earned_points = quote["earned_points"]
+        order_id = new_order_id()
 
-        if coins_used > 0:
-            deduct_result = users_collection.update_one(
-                {"_id": ObjectId(user_id), "points": {"$gte": coins_used}},
-                {"$inc": {"points": -coins_used}},
-            )
-            if deduct_result.modified_count == 0:
-                raise ValueError("Insufficient coins balance")
+        order_doc = {
+            "_id": ObjectId(),
+            "order_id": order_id,
+            "user_id": user_id,
+            "actual_subtotal": quote["items_subtotal"],
+            "shipping_fee": quote["shipping_fee"],
+            "cart_total": quote["cart_total"],
+            "coins_used": coins_used,
+            "coin_discount_value": quote["coin_discount_value"],
+            "cash_paid": quote["final_total"],
+            "earned_points": earned_points,
+            "order_items": quote["normalized_items"],
+            "payment_method": data.get("payment_method", "cod"),
+            "utr_number": data.get("utr_number"),
+            "address": data.get("address", {}),
+            "status": "pending",
+            "created_at": datetime.utcnow(),
+        }
+        order_doc.update(search_fields("orders", order_doc))
 
-        order_id = str(uuid.uuid4())[:8].upper()
+        # Earned points are credited now unless the outbox is asked to do it.
+        deferred_points = earned_points if getattr(settings, "ORDER_DEFER_POINTS_CREDIT", False) else 0
+        credited_points = earned_points - deferred_points
 
-        orders_collection.insert_one(
-            {
-                "_id": ObjectId(),
-                "order_id": order_id,
-                "user_id": user_id,
-                "actual_subtotal": quote["items_subtotal"],
-                "shipping_fee": quote["shipping_fee"],
-                "cart_total": quote["cart_total"],
-                "coins_used": coins_used,
-                "coin_discount_value": quote["coin_discount_value"],
-                "cash_paid": quote["final_total"],
-                "earned_points": earned_points,
-                "order_items": quote["normalized_items"],
-                "payment_method": data.get("payment_method", "cod"),
-                "utr_number": data.get("utr_number"),
-                "address": data.get("address", {}),
-                "status": "pending",
-                "created_at": datetime.utcnow(),
-            }
+        # The balance only has to be read when the order moves no points;
+        # that read also stands in for the existence check of the points update.
+        unchanged_points = 0
+        if coins_used == 0 and credited_points == 0:
+            if not identity.user:
+                raise ValueError("User not found")
+            unchanged_points = identity.user.get("points", 0)
+
+        if before_place is not None:
+            before_place()
+        final_points = place_order(
+            users_collection, orders_collection, user_id, order_doc,
+            coins_used, credited_points, fallback_points=unchanged_points,
         )
+        if on_placed is not None:
+            on_placed(order_id)
 
-        if earned_points > 0:
-            users_collection.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$inc": {"points": earned_points}},
-            )
+        identity.set_points(final_points)
+        if coins_used > 0 or credited_points > 0:
+            leaderboard.record(user_id, final_points, name)
 
-        final_user = users_collection.find_one({"_id": ObjectId(user_id)})
-        final_points = final_user.get("points", 0) if final_user else 0
+        jobs = order_side_effects(order_doc, deferred_points)
+        try:
+            outbox.enqueue(jobs)
+        except Exception:
+            # The order stands; only the deferred credit must not be lost.
+            logger.exception("Outbox enqueue failed for order %s", order_id)
+            if deferred_points > 0:
+                credit_points(jobs[-1][1])
 
         return order_id, earned_points, final_points, quote
 
+    except IdempotencyError:
+        raise
     except Exception as e:
         raise ValueError(str(e))
@@ -2,9 +2,9 @@ from rest_framework.response import Response
 from rest_framework import status
 import traceback
 
-def board(users_cursor) :
+def board(load_users) :
     try :
-        users = list(users_cursor) 
+        users = list(load_users()) 
             
         print(f'Found {len(users)} users for leaderboard')
         leaderboard = []
@@ -1,19 +1,12 @@
 from rest_framework.response import Response
-from utils.jwt_helper import decode_token
-from bson import ObjectId
 
 
-def ProfiView(request, users_collection) :
+def ProfiView(identity) :
     try:
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
+        if not identity.has_bearer:
             return Response({'error': 'Token required'}, status=401)
         
-        token = auth_header.split(' ')[1]
-        payload = decode_token(token)
-        user_id = payload['user_id']
-        
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        user = identity.user
         if not user:
             return Response({'error': 'User not found'}, status=404)
         
@@ -1,17 +1,14 @@
 from mongo.collections import users_col, referrals_col
 from bson import ObjectId
-from utils.jwt_helper import decode_token
 import traceback
 
-def get_my_referrals(auth_header: str):
+def get_my_referrals(identity):
     """Get user's referrals - SAFE & COMPLETE"""
     try:
-        if not auth_header or not auth_header.startswith("Bearer "):
+        if not identity.has_bearer:
             return []
         
-        token = auth_header.replace("Bearer ", "")
-        payload = decode_token(token)
-        user_id = payload.get("user_id")
+        user_id = identity.user_id
         
         if not user_id:
             return []
@@ -1,5 +1,7 @@
 from datetime import datetime
 from rest_framework.response import Response
+from utils.password import PasswordHashingBusy
+from utils.token_cache import invalidate_user_tokens
 
 
 def RPassword(request, otps_col, users_col, hash_password):
@@ -29,15 +31,21 @@ def RPassword(request, otps_col, users_col, hash_password):
     if not otp_doc:
         return Response({"success": False, "error": "Verify OTP first"}, status=400)
 
-    hashed_password = hash_password(new_password)
-    result = users_col.update_one(
+    try:
+        hashed_password = hash_password(new_password)
+    except PasswordHashingBusy:
+        return Response({"success": False, "error": "Server busy, please retry"}, status=503)
+    user = users_col.find_one_and_update(
         {'phone': phone, 'email': email},
-        {'$set': {'password': hashed_password}}
+        {'$set': {'password': hashed_password}},
+        projection={'_id': 1}
     )
     
-    if result.modified_count == 0:
+    if not user:
         return Response({"success": False, "error": "User not found"}, status=404)
 
+    invalidate_user_tokens(user['_id'])
+
     otps_col.delete_one({'_id': otp_doc['_id']})
     
     print("PASSWORD RESET SUCCESS!")
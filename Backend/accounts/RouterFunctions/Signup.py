@@ -1,10 +1,13 @@
 from rest_framework.response import Response
 from mongo.collections import users_col, referrals_col
-from utils.password import hash_password, verify_password
+from utils.password import hash_password, verify_password, PasswordHashingBusy
 from datetime import datetime
 from bson import ObjectId
 from bson.errors import InvalidId
 from utils.jwt import generate_tokens_for_user
+from pymongo import ReturnDocument
+from accounts.admin_search import search_fields
+from accounts.leaderboard import leaderboard
 
 
 def _generate_referral_code():
@@ -38,7 +41,7 @@ def signup_logic(data, phone, password, name, email, referral_code):
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
         }
-        
+        user_doc.update(search_fields("users", user_doc))
 
         result = users_col.insert_one(user_doc)
         user_id = str(result.inserted_id)
@@ -61,10 +64,18 @@ def signup_logic(data, phone, password, name, email, referral_code):
                     print(f"Referral found: {referrer.get('name', 'Unknown')} -> {name}")
                     
 
-                    users_col.update_one(
+                    updated_referrer = users_col.find_one_and_update(
                         {"_id": referrer["_id"]}, 
-                        {"$inc": {"points": 100}, "$currentDate": {"updated_at": True}}
+                        {"$inc": {"points": 100}, "$currentDate": {"updated_at": True}},
+                        projection={"name": 1, "points": 1},
+                        return_document=ReturnDocument.AFTER,
                     )
+                    if updated_referrer:
+                        leaderboard.record(
+                            updated_referrer["_id"],
+                            updated_referrer.get("points", 0),
+                            updated_referrer.get("name"),
+                        )
                     
 
                     users_col.update_one(
@@ -73,7 +84,7 @@ def signup_logic(data, phone, password, name, email, referral_code):
                     )
 
 
-                    referrals_col.insert_one({
+                    referral_doc = {
                         "referrer_id": str(referrer["_id"]),
                         "referred_user": {
                             "id": user_id,
@@ -85,7 +96,9 @@ def signup_logic(data, phone, password, name, email, referral_code):
                         "referee_points": 50,
                         "status": "completed",
                         "created_at": datetime.utcnow(),
-                    })
+                    }
+                    referral_doc.update(search_fields("referrals", referral_doc))
+                    referrals_col.insert_one(referral_doc)
                     print("Referral points awarded!")
 
             except InvalidId:
@@ -97,6 +110,7 @@ def signup_logic(data, phone, password, name, email, referral_code):
         
 
         user = users_col.find_one({"_id": ObjectId(user_id)})
+        leaderboard.record(user_id, user.get("points", 0), user.get("name"))
         
         print(f"Signup complete: {name}, Points: {user.get('points', 0)}")
         
@@ -106,6 +120,8 @@ def signup_logic(data, phone, password, name, email, referral_code):
     except ValueError as ve:
         print(f"Signup validation error: {str(ve)}")
         raise ve
+    except PasswordHashingBusy:
+        raise
     except Exception as e:
         print(f"Signup error: {str(e)}")
         raise ValueError("Signup failed. Please try again.")
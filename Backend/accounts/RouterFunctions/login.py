@@ -1,6 +1,7 @@
 from rest_framework.response import Response
+from pymongo.errors import PyMongoError
 from mongo.collections import users_col, referrals_col
-from utils.password import hash_password, verify_password
+from utils.password import hash_password, verify_password, needs_rehash, PasswordHashingBusy
 from utils.jwt import generate_tokens_for_user
 
 
@@ -9,8 +10,22 @@ def LoginLogic(phone, password) :
         return Response({"detail": "Phone and password required"}, status=400)
 
     user = users_col.find_one({"phone": phone})
-    if not user or not verify_password(password, user["password"]):
-        return Response({"detail": "Invalid credentials"}, status=401)
+    try:
+        if not user or not verify_password(password, user["password"]):
+            return Response({"detail": "Invalid credentials"}, status=401)
+    except PasswordHashingBusy:
+        return Response({"detail": "Server busy, please retry"}, status=503)
+
+    # The first needs_rehash() may calibrate the cost; a busy pool or Mongo
+    # error there only skips the rehash, never the login.
+    try:
+        if needs_rehash(user["password"]):
+            users_col.update_one(
+                {"_id": user["_id"], "password": user["password"]},
+                {"$set": {"password": hash_password(password)}},
+            )
+    except (PasswordHashingBusy, PyMongoError):
+        pass
      
     tokens = generate_tokens_for_user(str(user["_id"]))
     return tokens, user
\ No newline at end of file
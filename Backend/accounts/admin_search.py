@@ -0,0 +1,139 @@
+"""Compiles the admin `search` box into index-friendly Mongo filters.
+
+Raw input never reaches $regex. Every clause compile_search() emits is an
+exact match or a case-sensitive prefix regex anchored with ^, built from
+re.escape'd input. Mongo turns those into index bounds. Input routes by shape:
+
+- Phone-like (digits, "+", spaces, dashes): digits are matched against the
+  phone fields, exactly for 10 digits and as a prefix otherwise.
+- Order-id-like (one alphanumeric word): a prefix of the normalized order id.
+- ObjectId-like: an exact match on id fields such as referrer_id.
+- Anything that is not phone-like: a prefix of the lower-cased name and email copies kept in
+  *_lc fields (SEARCH_FIELDS). Input with "@" only looks at the emails.
+
+Writes keep the *_lc fields current through search_fields(). Run
+`manage.py backfill_search_fields` once for existing documents. Every
+search query runs under ADMIN_SEARCH_MAX_TIME_MS, so a broad search fails
+fast instead of tying up the server.
+"""
+
+import re
+
+from bson import ObjectId
+from django.conf import settings
+
+from .order_ids import normalize as normalize_order_id
+
+
+MAX_SEARCH_LENGTH = 64
+PHONE_INPUT = re.compile(r"[\d\s+()-]+")
+ORDER_ID_INPUT = re.compile(r"[0-9A-Za-z-]{3,16}")
+
+# Lower-cased copy -> source field, per collection.
+SEARCH_FIELDS = {
+    "users": {"name_lc": "name", "email_lc": "email"},
+    "referrals": {"referred_name_lc": "referred_user.name", "referred_email_lc": "referred_user.email"},
+    "orders": {"full_name_lc": "address.fullName"},
+}
+SEARCH_FIELDS["orders_archive"] = SEARCH_FIELDS["orders"]
+# Every lower-cased copy; internal, never part of an API response.
+SEARCH_FIELD_NAMES = frozenset(name for fields in SEARCH_FIELDS.values() for name in fields)
+
+
+class SearchSpec:
+    """Which fields of a collection each kind of input is matched against."""
+
+    def __init__(self, phone=(), order_id=(), object_id=(), name=(), email=()):
+        self.phone = phone
+        self.order_id = order_id
+        self.object_id = object_id
+        self.name = name
+        self.email = email
+
+
+USER_SEARCH = SearchSpec(phone=("phone",), name=("name_lc",), email=("email_lc",))
+REFERRAL_SEARCH = SearchSpec(
+    phone=("referred_user.phone",), object_id=("referrer_id",),
+    name=("referred_name_lc",), email=("referred_email_lc",),
+)
+ORDER_SEARCH = SearchSpec(phone=("address.phone",), order_id=("order_id",), name=("full_name_lc",))
+
+
+def search_max_time_ms():
+    return getattr(settings, "ADMIN_SEARCH_MAX_TIME_MS", 2000)
+
+
+def _prefix(value):
+    return {"$regex": "^" + re.escape(value)}
+
+
+def compile_search(raw, spec):
+    """A filter for `raw` under `spec`, or None when there is nothing to search."""
+    term = (raw or "").strip()[:MAX_SEARCH_LENGTH]
+    if not term:
+        return None
+
+    clauses = []
+    digits = re.sub(r"\D", "", term)
+    phone_like = len(digits) >= 3 and PHONE_INPUT.fullmatch(term)
+    if spec.phone and phone_like:
+        if len(digits) == 12 and digits.startswith("91"):
+            digits = digits[2:]
+        match = digits if len(digits) == 10 else _prefix(digits)
+        clauses.extend({field: match} for field in spec.phone)
+
+    if spec.object_id and ObjectId.is_valid(term):
+        clauses.extend({field: term} for field in spec.object_id)
+
+    if spec.order_id and ORDER_ID_INPUT.fullmatch(term):
+        clauses.extend({field: _prefix(normalize_order_id(term))} for field in spec.order_id)
+
+    if not phone_like:
+        lowered = term.lower()
+        text_fields = spec.email if "@" in term else tuple(spec.name) + tuple(spec.email)
+        clauses.extend({field: _prefix(lowered)} for field in text_fields)
+
+    if not clauses:
+        # Nothing in this collection can match; keep the query cheap and empty.
+        return {"_id": {"$in": []}}
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def _lookup(doc, path):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _lowered(value):
+    return value.strip().lower() if isinstance(value, str) else None
+
+
+def search_fields(collection_name, doc):
+    """The *_lc fields for a full document, to merge into an insert.
+
+    The fields are top-level, so the same dict also works in a $set.
+    """
+    return {
+        target: _lowered(_lookup(doc, source))
+        for target, source in SEARCH_FIELDS.get(collection_name, {}).items()
+    }
+
+
+def search_fields_for_update(collection_name, changes):
+    """The *_lc fields touched by a $set of `changes`.
+
+    `changes` may set a source field directly ("name") or its parent
+    ("address").
+    """
+    fields = {}
+    for target, source in SEARCH_FIELDS.get(collection_name, {}).items():
+        parent = source.split(".", 1)[0]
+        if source in changes:
+            fields[target] = _lowered(changes[source])
+        elif parent in changes:
+            fields[target] = _lowered(_lookup(changes, source))
+    return fields
@@ -1,6 +1,20 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "accounts"
+
+    def ready(self):
+        # Poll the outbox from boot, not from the first order this process
+        # takes. One-off manage.py commands (other than runserver) skip it.
+        if not getattr(settings, "OUTBOX_AUTOSTART", True):
+            return
+        if os.path.basename(sys.argv[0]) == "manage.py" and sys.argv[1:2] != ["runserver"]:
+            return
+        from .outbox import outbox
+        outbox.start()
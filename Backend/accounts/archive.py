@@ -0,0 +1,172 @@
+"""Hot/cold split of the orders collection.
+
+Delivered and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS are moved
+to orders_archive by `python manage.py archive_orders`. Only live orders stay
+in orders, so its working set and indexes stop growing with history.
+
+Each batch is idempotent, so an interrupted run can simply be started again:
+
+1. Read the oldest eligible orders.
+2. Upsert them into orders_archive with a bulk_write of ReplaceOne.
+3. Delete them from orders, guarded by their status. An order that left
+   its terminal status in the meantime keeps its hot copy, and its archive
+   copy is removed again.
+
+A crash between steps 2 and 3 leaves an order in both collections until the
+next run. merged_find() therefore drops archive copies of orders that are
+still hot.
+
+The dashboard needs totals without scanning the archive, so each batch adds
+its order count and delivered revenue to the counters document
+"orders_archive". rebuild_archive_stats() recomputes it from the archive.
+"""
+
+import heapq
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from pymongo import ReplaceOne
+
+from mongo.collections import counters_col
+from .db import get_orders_archive_collection, get_orders_collection
+
+
+ARCHIVE_STATUSES = ("delivered", "cancelled")
+REVENUE_STATUSES = ("confirmed", "shipped", "delivered")
+STATS_ID = "orders_archive"
+
+
+def archive_cutoff(days=None):
+    days = days if days is not None else getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 180)
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def _revenue(docs):
+    return sum(doc.get("cash_paid") or 0 for doc in docs if doc.get("status") in REVENUE_STATUSES)
+
+
+def archive_batch(cutoff, batch_size=500):
+    """Move one batch of eligible orders; returns how many left `orders`."""
+    orders = get_orders_collection()
+    archive = get_orders_archive_collection()
+
+    docs = list(
+        orders.find({"status": {"$in": list(ARCHIVE_STATUSES)}, "created_at": {"$lt": cutoff}})
+        .sort("created_at", 1)
+        .limit(batch_size)
+    )
+    if not docs:
+        return 0
+
+    archived_at = datetime.now(timezone.utc)
+    archive.bulk_write(
+        [ReplaceOne({"_id": doc["_id"]}, dict(doc, archived_at=archived_at), upsert=True) for doc in docs],
+        ordered=False,
+    )
+
+    ids = [doc["_id"] for doc in docs]
+    deleted = orders.delete_many({"_id": {"$in": ids}, "status": {"$in": list(ARCHIVE_STATUSES)}})
+    moved = docs
+    if deleted.deleted_count < len(ids):
+        # Reopened since we read them: they stay hot, so drop the archive copy.
+        still_hot = {doc["_id"] for doc in orders.find({"_id": {"$in": ids}}, {"_id": 1})}
+        archive.delete_many({"_id": {"$in": list(still_hot)}})
+        moved = [doc for doc in docs if doc["_id"] not in still_hot]
+
+    if moved:
+        counters_col.update_one(
+            {"_id": STATS_ID},
+            {"$inc": {"orders": len(moved), "revenue": _revenue(moved)}},
+            upsert=True,
+        )
+    return len(moved)
+
+
+def archive_orders(days=None, batch_size=500, max_batches=None, log=print):
+    """Archive eligible orders batch by batch; returns the number moved."""
+    cutoff = archive_cutoff(days)
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        batches += 1
+        total += moved
+        log(f"batch {batches}: moved {moved} (total {total})")
+        if moved == 0:
+            break
+    return total
+
+
+def rebuild_archive_stats():
+    """Recompute the archive counters from orders_archive itself."""
+    archive = get_orders_archive_collection()
+    result = list(archive.aggregate([
+        {"$group": {
+            "_id": None,
+            "orders": {"$sum": 1},
+            "revenue": {"$sum": {"$cond": [
+                {"$in": ["$status", list(REVENUE_STATUSES)]}, {"$ifNull": ["$cash_paid", 0]}, 0,
+            ]}},
+        }},
+    ]))
+    stats = result[0] if result else {"orders": 0, "revenue": 0}
+    counters_col.update_one(
+        {"_id": STATS_ID},
+        {"$set": {"orders": stats["orders"], "revenue": stats["revenue"]}},
+        upsert=True,
+    )
+    return {"orders": stats["orders"], "revenue": stats["revenue"]}
+
+
+def archive_stats():
+    stats = counters_col.find_one({"_id": STATS_ID}) or {}
+    return {"orders": stats.get("orders", 0), "revenue": stats.get("revenue", 0)}
+
+
+def include_archived(request):
+    return request.query_params.get("include_archived", "").lower() in ("1", "true", "yes")
+
+
+def merged_find(query, projection=None, sort_field="created_at", skip=0, limit=0, descending=True,
+                max_time_ms=None):
+    """Documents from orders and orders_archive, newest `sort_field` first
+    (oldest first with descending=False).
+
+    Each side is asked for at most skip + limit documents in the same order
+    and the two streams are merged. That is fine for the admin pages this
+    serves, but deep pages cost more than they do on orders alone.
+    """
+    window = skip + limit if limit else 0
+    if projection and any(projection.values()) and sort_field not in projection:
+        # The merge key must be fetched, or every document sorts as missing it.
+        projection = {**projection, sort_field: 1}
+
+    def side(collection):
+        direction = -1 if descending else 1
+        cursor = collection.find(query, projection).sort([(sort_field, direction), ("_id", direction)])
+        if max_time_ms:
+            cursor = cursor.max_time_ms(max_time_ms)
+        return list(cursor.limit(window)) if window else list(cursor)
+
+    hot = side(get_orders_collection())
+    hot_ids = {doc["_id"] for doc in hot}
+    cold = [doc for doc in side(get_orders_archive_collection()) if doc["_id"] not in hot_ids]
+
+    def key(doc):
+        value = doc.get(sort_field)
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            value = value.replace(tzinfo=None) - value.utcoffset()
+        return (value is not None, value or datetime.min, doc["_id"])
+
+    merged = heapq.merge(hot, cold, key=key, reverse=descending)
+    docs = list(merged)
+    return docs[skip:skip + limit] if limit else docs[skip:]
+
+
+def merged_finder(max_time_ms=None):
+    """utils.pagination finder that pages across both collections."""
+    def find(query, projection, field, descending, limit):
+        return merged_find(
+            query, projection, field, limit=limit, descending=descending, max_time_ms=max_time_ms,
+        )
+    return find
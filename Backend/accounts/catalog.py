@@ -0,0 +1,244 @@
+"""Versioned in-process cache of the public product catalog.
+
+The catalog version lives in a single `catalog_meta` document that the admin
+product views bump on every write. Each worker keeps the serialized product
+list for the version it last saw and re-reads the stamp at most every
+CATALOG_POLL_SECONDS, so products_public does no Mongo work in steady state
+and picks up other workers' writes within the poll interval.
+
+Each snapshot also renders its JSON body once and keeps gzip and brotli
+copies of it, together with a strong ETag per encoding, so the endpoint can
+answer with pre-built bytes or a 304.
+
+Every bump also appends a (version, product_id, op) row to
+`catalog_changes`, which lets clients sync with `since=<version>` and
+receive only the products changed after that version plus tombstones.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from django.conf import settings
+from pymongo import ReturnDocument
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from .db import (
+    get_products_collection,
+    get_catalog_meta_collection,
+    get_catalog_changes_collection,
+)
+
+
+CATALOG_META_ID = "catalog"
+MAX_CACHED_DELTAS = 64
+
+
+def serialize_product(product):
+    product = dict(product)
+    if "_id" in product:
+        product["_id"] = str(product["_id"])
+    if "id" in product:
+        product["id"] = str(product["id"])
+    return product
+
+
+class CatalogSnapshot:
+    def __init__(self, version, products):
+        self.version = version
+        self.products = products
+        self._bodies = None
+        self._etags = None
+        self._by_id = None
+        self._by_custom_id = None
+        self._deltas = {}
+        self._lock = threading.Lock()
+
+    @property
+    def by_id(self):
+        if self._by_id is None:
+            self._by_id = {p["_id"]: p for p in self.products if "_id" in p}
+        return self._by_id
+
+    def lookup(self, key):
+        """Product by stringified `_id` or by its custom `id` field."""
+        product = self.by_id.get(key)
+        if product is None:
+            if self._by_custom_id is None:
+                self._by_custom_id = {p["id"]: p for p in self.products if "id" in p}
+            product = self._by_custom_id.get(key)
+        return product
+
+    def _render(self):
+        raw = json.dumps(
+            {"success": True, "full": True, "version": self.version, "data": self.products},
+            cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"),
+        ).encode("utf-8")
+        bodies = {"identity": raw, "gzip": gzip.compress(raw, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(raw, quality=11)
+
+        digest = hashlib.sha1(raw).hexdigest()[:16]
+        etags = {
+            encoding: f'"catalog-{self.version}-{digest}"' if encoding == "identity"
+            else f'"catalog-{self.version}-{digest}-{encoding}"'
+            for encoding in bodies
+        }
+        self._bodies, self._etags = bodies, etags
+
+    def body(self, encoding):
+        """(bytes, etag) of the rendered catalog in `encoding`."""
+        if self._bodies is None:
+            with self._lock:
+                if self._bodies is None:
+                    self._render()
+        return self._bodies[encoding], self._etags[encoding]
+
+    @property
+    def encodings(self):
+        if self._bodies is None:
+            self.body("identity")
+        return tuple(self._bodies)
+
+    def matches(self, if_none_match):
+        """True if an If-None-Match header names any encoding of this version."""
+        if not if_none_match:
+            return False
+        if self._etags is None:
+            self.body("identity")
+        candidates = set()
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            candidates.add(tag[2:] if tag.startswith("W/") else tag)
+        return "*" in candidates or bool(candidates & set(self._etags.values()))
+
+
+class CatalogCache:
+    def __init__(self, poll_seconds=5):
+        self.poll_seconds = poll_seconds
+        self._snapshot = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _read_version(self):
+        meta = get_catalog_meta_collection().find_one({"_id": CATALOG_META_ID}, {"version": 1})
+        return meta.get("version", 0) if meta else 0
+
+    def snapshot(self):
+        """Current CatalogSnapshot, reloading only when the version moved."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.poll_seconds:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._checked_at < self.poll_seconds:
+                return self._snapshot
+            # Read the stamp before the products: a write racing with the load
+            # bumps the version again and triggers another reload.
+            version = self._read_version()
+            if self._snapshot is None or self._snapshot.version != version:
+                products = [serialize_product(p) for p in get_products_collection().find({})]
+                self._snapshot = CatalogSnapshot(version, products)
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def bump(self, product_id, op="upsert"):
+        """Record a product write (op is "upsert" or "delete"); returns the new version."""
+        meta = get_catalog_meta_collection().find_one_and_update(
+            {"_id": CATALOG_META_ID},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        get_catalog_changes_collection().insert_one({
+            "version": meta["version"],
+            "product_id": str(product_id),
+            "op": op,
+            "created_at": datetime.utcnow(),
+        })
+        self._checked_at = float("-inf")
+        return meta["version"]
+
+    def resolve(self, keys):
+        """{key: product} for `_id`/`id` keys; one $in query for cache misses."""
+        snapshot = self.snapshot()
+        found, missing = {}, []
+        for key in set(keys):
+            product = snapshot.lookup(key)
+            if product is None:
+                missing.append(key)
+            else:
+                found[key] = product
+
+        if missing:
+            # Products created by another worker since our last version poll.
+            ids = list(missing) + [ObjectId(k) for k in missing if ObjectId.is_valid(k)]
+            for product in get_products_collection().find(
+                {"$or": [{"_id": {"$in": ids}}, {"id": {"$in": missing}}]}
+            ):
+                product = serialize_product(product)
+                for key in (product.get("_id"), product.get("id")):
+                    if key in missing:
+                        found[key] = product
+        return found
+
+    def changes_since(self, since, snapshot):
+        """{product_id: op} for changes in (since, snapshot.version], or None.
+
+        None means the change log cannot bridge the gap (trimmed by its TTL,
+        or a change row not written yet) and the caller should resync fully.
+        bump() increments the version before it writes the row, so a
+        concurrent bump can leave a hole anywhere in the range, not only at
+        its start; every version in the range must be present.
+        """
+        if since == snapshot.version:
+            return {}
+        if since > snapshot.version:
+            return None
+        changes = list(
+            get_catalog_changes_collection()
+            .find(
+                {"version": {"$gt": since, "$lte": snapshot.version}},
+                {"_id": 0, "version": 1, "product_id": 1, "op": 1},
+            )
+            .sort("version", 1)
+        )
+        # Versions are unique (version_unique), so a full count means no holes.
+        if len(changes) != snapshot.version - since:
+            return None
+        return {change["product_id"]: change["op"] for change in changes}
+
+    def delta(self, since):
+        """Products changed after `since`, or None if a full sync is needed."""
+        snapshot = self.snapshot()
+        cached = snapshot._deltas.get(since)
+        if cached is not None:
+            return cached
+
+        changes = self.changes_since(since, snapshot)
+        if changes is None:
+            return None
+        upserts, deletes = [], []
+        for product_id, op in changes.items():
+            product = snapshot.by_id.get(product_id)
+            if op == "delete" or product is None:
+                deletes.append(product_id)
+            else:
+                upserts.append(product)
+
+        delta = {"version": snapshot.version, "upserts": upserts, "deletes": deletes}
+        if len(snapshot._deltas) < MAX_CACHED_DELTAS:
+            snapshot._deltas[since] = delta
+        return delta
+
+
+catalog = CatalogCache(poll_seconds=getattr(settings, "CATALOG_POLL_SECONDS", 5))
@@ -1,27 +1,35 @@
 """Mongo collection helpers used by admin views."""
 
-from pymongo import MongoClient
-from django.conf import settings
-
-_client = MongoClient(settings.MONGO_URI)
-_db = _client[settings.MONGO_DB_NAME]
+from mongo.client import get_db
 
 
 def get_users_collection():
-    return _db["users"]
+    return get_db()["users"]
 
 
 def get_referrals_collection():
-    return _db["referrals"]
+    return get_db()["referrals"]
 
 
 def get_orders_collection():
-    return _db["orders"]
+    return get_db()["orders"]
 
 
 def get_products_collection():
-    return _db["products"]
+    return get_db()["products"]
 
 
 def get_admins_collection():
-    return _db["admins"]
+    return get_db()["admins"]
+
+
+def get_catalog_meta_collection():
+    return get_db()["catalog_meta"]
+
+
+def get_catalog_changes_collection():
+    return get_db()["catalog_changes"]
+
+
+def get_orders_archive_collection():
+    return get_db()["orders_archive"]
@@ -0,0 +1,150 @@
+"""Idempotency-Key support for endpoints that must not run twice.
+
+A client that retries a request with the same Idempotency-Key gets the
+original response back instead of a second execution. Outcomes live in the
+idempotency_keys collection under "<user_id>:<key>", and a TTL index expires
+them after a day (mongo/indexes.py).
+
+claim() first reads the key. The key is either replayed, still in progress
+(409), or reused for a different payload (422). If it is unknown, claim()
+inserts a pending entry. The unique _id ensures only one of two concurrent
+first attempts wins. complete() stores the response. release() deletes the
+pending entry when the request failed, so the client may retry with the
+same key.
+
+A pending entry is only leased for IDEMPOTENCY_LEASE_SECONDS. If the worker
+holding it dies, a retry after the lease takes the key over instead of
+getting 409 until the TTL. Each claim carries its own lease_id. Right before
+the side effect the holder calls renew(), which fails if the lease was taken
+over and otherwise extends it; the lease never runs shorter than twice the
+Mongo socket timeout, so the write that follows finishes or fails before a
+retry could take over. release() only deletes the caller's own lease. Once the side effect has happened the handler
+calls mark_placed(); a placed entry is never taken over or released, so a
+failure after that point can not lead to a second execution.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from mongo.collections import idempotency_col
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def request_key(request):
+    """The Idempotency-Key header, or None; raises on malformed keys."""
+    key = request.headers.get(HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters", 400)
+    return key
+
+
+def fingerprint(data):
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _doc_id(user_id, key):
+    return f"{user_id}:{key}"
+
+
+def lease_seconds():
+    configured = getattr(settings, "IDEMPOTENCY_LEASE_SECONDS", 60)
+    socket_timeout = getattr(settings, "MONGO_SOCKET_TIMEOUT_MS", 20000) / 1000
+    return max(configured, 2 * socket_timeout)
+
+
+def _lease_until(now):
+    return now + timedelta(seconds=lease_seconds())
+
+
+def claim(user_id, key, data, lease_id=None):
+    """Stored (status, body) for a finished key, or None once the key is ours
+    under `lease_id`."""
+    doc_id = _doc_id(user_id, key)
+    digest = fingerprint(data)
+    now = datetime.utcnow()
+
+    existing = idempotency_col.find_one({"_id": doc_id})
+    if existing is None:
+        try:
+            idempotency_col.insert_one({
+                "_id": doc_id,
+                "state": "pending",
+                "fingerprint": digest,
+                "lease_id": lease_id,
+                "lease_until": _lease_until(now),
+                "created_at": now,
+            })
+            return None
+        except DuplicateKeyError:
+            existing = idempotency_col.find_one({"_id": doc_id})
+            if existing is None:
+                raise IdempotencyError("Request with this Idempotency-Key is in progress", 409)
+
+    if existing.get("fingerprint") != digest:
+        raise IdempotencyError("Idempotency-Key was already used with a different request", 422)
+    state = existing.get("state")
+    if state == "placed":
+        raise IdempotencyError(
+            f"Request with this Idempotency-Key already placed {existing.get('result_id')}", 409,
+        )
+    if state != "done":
+        # The holder may have died; take over a pending entry whose lease ran out.
+        taken = idempotency_col.find_one_and_update(
+            {"_id": doc_id, "state": "pending", "lease_until": {"$lt": now}},
+            {"$set": {"lease_id": lease_id, "lease_until": _lease_until(now)}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if taken is not None:
+            return None
+        raise IdempotencyError("Request with this Idempotency-Key is in progress", 409)
+    return existing["status"], existing["body"]
+
+
+def renew(user_id, key, lease_id):
+    """Fence before the side effect: extend our lease, or raise if we lost it."""
+    renewed = idempotency_col.update_one(
+        {"_id": _doc_id(user_id, key), "state": "pending", "lease_id": lease_id},
+        {"$set": {"lease_until": _lease_until(datetime.utcnow())}},
+    )
+    if renewed.matched_count == 0:
+        raise IdempotencyError("Request with this Idempotency-Key is in progress", 409)
+
+
+def mark_placed(user_id, key, result_id):
+    """Record that the side effect happened; the key can no longer be reclaimed."""
+    idempotency_col.update_one(
+        {"_id": _doc_id(user_id, key), "state": "pending"},
+        {"$set": {"state": "placed", "result_id": result_id}, "$unset": {"lease_until": ""}},
+    )
+
+
+def complete(user_id, key, status, body):
+    idempotency_col.update_one(
+        {"_id": _doc_id(user_id, key)},
+        {
+            "$set": {"state": "done", "status": status, "body": body, "completed_at": datetime.utcnow()},
+            "$unset": {"lease_until": ""},
+        },
+    )
+
+
+def release(user_id, key, lease_id=None):
+    idempotency_col.delete_one({"_id": _doc_id(user_id, key), "state": "pending", "lease_id": lease_id})
@@ -0,0 +1,262 @@
+"""In-process points leaderboard.
+
+Keeps the highest-scoring users of this worker's view in a sorted list, so
+LeaderboardView never touches Mongo in steady state. The list is seeded from
+users_col once and then fed by record()/remove() from every code path that
+changes points. A background reconcile re-seeds it every
+LEADERBOARD_RECONCILE_SECONDS to pick up writes made by other workers.
+
+Invariant: every user not tracked has points <= `_floor`, so any user at or
+above the floor can be placed exactly. Users that fall below the floor are
+dropped; if that leaves fewer than `size` entries the next read re-seeds.
+
+PointsRankIndex answers "what is my rank?" for any user: a sorted list of
+every user's points gives the number of users above a score by bisection.
+Its size follows the number of users, not the largest score. It is seeded on
+a background thread after the first rank lookup (which is answered with
+indexed counts from Mongo meanwhile), re-seeded every
+LEADERBOARD_RANK_RECONCILE_SECONDS, and kept in step by the same
+record()/remove() calls.
+"""
+
+import bisect
+import threading
+import time
+
+from bson import ObjectId
+from django.conf import settings
+
+from mongo.collections import users_col
+
+
+class PointsRankIndex:
+    def __init__(self, reconcile_seconds=1800):
+        self.reconcile_seconds = reconcile_seconds
+        self._sorted = []      # every tracked user's points, ascending
+        self._points = {}      # user_id -> points
+        self._seeded_at = None
+        self._seeding = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _clean(points):
+        try:
+            return max(int(points or 0), 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def _insert(self, points):
+        bisect.insort(self._sorted, points)
+
+    def _discard(self, points):
+        i = bisect.bisect_left(self._sorted, points)
+        if i < len(self._sorted) and self._sorted[i] == points:
+            del self._sorted[i]
+
+    def seed(self):
+        points_by_user = {
+            str(doc["_id"]): self._clean(doc.get("points"))
+            for doc in users_col.find({}, {"points": 1})
+        }
+        ordered = sorted(points_by_user.values())
+        with self._lock:
+            self._points = points_by_user
+            self._sorted = ordered
+            self._seeded_at = time.monotonic()
+
+    def _seed_in_background(self):
+        try:
+            self.seed()
+        except Exception as e:
+            print(f"Rank index seed ERROR: {str(e)}")
+        finally:
+            self._seeding = False
+
+    def _ensure_fresh(self):
+        """True once seeded; (re)seeds happen on a background thread."""
+        stale = (
+            self._seeded_at is None
+            or time.monotonic() - self._seeded_at >= self.reconcile_seconds
+        )
+        if stale and not self._seeding:
+            with self._lock:
+                if not self._seeding:
+                    self._seeding = True
+                    threading.Thread(target=self._seed_in_background, daemon=True).start()
+        return self._seeded_at is not None
+
+    def update(self, user_id, points):
+        if self._seeded_at is None:
+            return
+        points = self._clean(points)
+        with self._lock:
+            previous = self._points.get(user_id)
+            if previous is not None:
+                self._discard(previous)
+            self._points[user_id] = points
+            self._insert(points)
+
+    def remove(self, user_id):
+        with self._lock:
+            previous = self._points.pop(user_id, None)
+            if previous is not None:
+                self._discard(previous)
+
+    def points_of(self, user_id):
+        if not self._ensure_fresh():
+            return None
+        return self._points.get(user_id)
+
+    def rank(self, points):
+        """(rank, total users, percentile) for a score; ties share a rank.
+
+        Until the first background seed finishes, the counts come from Mongo
+        (points_desc index) instead.
+        """
+        points = self._clean(points)
+        if self._ensure_fresh():
+            with self._lock:
+                total = len(self._sorted)
+                above = total - bisect.bisect_right(self._sorted, points)
+        else:
+            total = users_col.estimated_document_count()
+            above = users_col.count_documents({"points": {"$gt": points}})
+        at_or_below = max(total - above, 0)
+        percentile = round(100.0 * at_or_below / total, 2) if total else 100.0
+        return above + 1, total, percentile
+
+
+class Leaderboard:
+    def __init__(self, size=50, capacity=200, reconcile_seconds=300, rank_reconcile_seconds=1800):
+        self.size = size
+        self.capacity = max(capacity, size)
+        self.reconcile_seconds = reconcile_seconds
+        self._keys = []        # sorted (-points, user_id)
+        self._entries = {}     # user_id -> (points, name)
+        self._floor = float("-inf")
+        self._seeded_at = None
+        self._reconciling = False
+        self._lock = threading.Lock()
+        self.ranks = PointsRankIndex(rank_reconcile_seconds)
+
+    def seed(self):
+        docs = list(
+            users_col.find({}, {"name": 1, "points": 1})
+            .sort("points", -1)
+            .limit(self.capacity)
+        )
+        keys, entries = [], {}
+        for doc in docs:
+            user_id = str(doc["_id"])
+            points = doc.get("points", 0) or 0
+            entries[user_id] = (points, doc.get("name"))
+            keys.append((-points, user_id))
+        keys.sort()
+        floor = -keys[-1][0] if len(keys) >= self.capacity else float("-inf")
+
+        with self._lock:
+            self._keys, self._entries, self._floor = keys, entries, floor
+            self._seeded_at = time.monotonic()
+        print(f"Leaderboard seeded with {len(keys)} users")
+
+    def _reconcile(self):
+        try:
+            self.seed()
+        except Exception as e:
+            print(f"Leaderboard reconcile ERROR: {str(e)}")
+        finally:
+            self._reconciling = False
+
+    def _ensure_fresh(self):
+        if self._seeded_at is None:
+            self.seed()
+            return
+        if time.monotonic() - self._seeded_at < self.reconcile_seconds or self._reconciling:
+            return
+        self._reconciling = True
+        threading.Thread(target=self._reconcile, daemon=True).start()
+
+    def top(self, n=None):
+        """Top `n` users as {"_id", "name", "points"} dicts, highest first."""
+        self._ensure_fresh()
+        n = min(n or self.size, self.capacity)
+        with self._lock:
+            return [
+                {"_id": user_id, "name": self._entries[user_id][1], "points": -neg_points}
+                for neg_points, user_id in self._keys[:n]
+            ]
+
+    def record(self, user_id, points, name=None):
+        """Set a user's absolute points after a write to users_col."""
+        user_id = str(user_id)
+        points = points or 0
+        self.ranks.update(user_id, points)
+        with self._lock:
+            current = self._entries.pop(user_id, None)
+            if current is not None:
+                self._keys.remove((-current[0], user_id))
+                if name is None:
+                    name = current[1]
+
+            if points < self._floor:
+                if len(self._keys) < self.size:
+                    self._seeded_at = None
+                return
+
+            bisect.insort(self._keys, (-points, user_id))
+            self._entries[user_id] = (points, name)
+            while len(self._keys) > self.capacity:
+                neg_points, dropped = self._keys.pop()
+                del self._entries[dropped]
+                self._floor = max(self._floor, -neg_points)
+
+    def remove(self, user_id):
+        user_id = str(user_id)
+        self.ranks.remove(user_id)
+        with self._lock:
+            current = self._entries.pop(user_id, None)
+            if current is not None:
+                self._keys.remove((-current[0], user_id))
+                if len(self._keys) < self.size and self._floor != float("-inf"):
+                    self._seeded_at = None
+
+
+    def standing(self, user_id, neighbours=3):
+        """Rank, percentile and the nearest users above and below `user_id`."""
+        user_id = str(user_id)
+        points = self.ranks.points_of(user_id)
+        if points is None:
+            user = users_col.find_one({"_id": ObjectId(user_id)}, {"name": 1, "points": 1})
+            if not user:
+                return None
+            points = user.get("points", 0) or 0
+            self.record(user_id, points, user.get("name"))
+
+        rank, total, percentile = self.ranks.rank(points)
+        projection = {"name": 1, "points": 1}
+        above = list(
+            users_col.find({"points": {"$gt": points}}, projection)
+            .sort("points", 1)
+            .limit(neighbours)
+        )
+        below = list(
+            users_col.find({"points": {"$lte": points}, "_id": {"$ne": ObjectId(user_id)}}, projection)
+            .sort("points", -1)
+            .limit(neighbours)
+        )
+        return {
+            "rank": rank,
+            "points": points,
+            "percentile": percentile,
+            "total_users": total,
+            "above": list(reversed(above)),
+            "below": below,
+        }
+
+
+leaderboard = Leaderboard(
+    size=getattr(settings, "LEADERBOARD_SIZE", 50),
+    capacity=getattr(settings, "LEADERBOARD_CAPACITY", 200),
+    reconcile_seconds=getattr(settings, "LEADERBOARD_RECONCILE_SECONDS", 300),
+    rank_reconcile_seconds=getattr(settings, "LEADERBOARD_RANK_RECONCILE_SECONDS", 1800),
+)
@@ -0,0 +1,47 @@
+"""Move old delivered and cancelled orders into orders_archive."""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.archive import archive_cutoff, archive_orders, rebuild_archive_stats, ARCHIVE_STATUSES
+from accounts.db import get_orders_collection
+
+
+class Command(BaseCommand):
+    help = "Archive terminal-state orders older than ORDER_ARCHIVE_AFTER_DAYS in resumable batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 180),
+            help="Archive orders created more than this many days ago.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=getattr(settings, "ORDER_ARCHIVE_BATCH_SIZE", 500),
+            help="Orders moved per batch.",
+        )
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count eligible orders.")
+        parser.add_argument(
+            "--rebuild-stats", action="store_true",
+            help="Recompute the dashboard's archive totals from orders_archive.",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            eligible = get_orders_collection().count_documents({
+                "status": {"$in": list(ARCHIVE_STATUSES)},
+                "created_at": {"$lt": archive_cutoff(options["days"])},
+            })
+            self.stdout.write(f"{eligible} orders eligible for archival")
+            return
+
+        moved = archive_orders(
+            days=options["days"],
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+            log=self.stdout.write,
+        )
+        if options["rebuild_stats"]:
+            stats = rebuild_archive_stats()
+            self.stdout.write(f"archive totals: {stats['orders']} orders, revenue {stats['revenue']}")
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} orders"))
@@ -0,0 +1,64 @@
+"""Fill in the lower-cased *_lc fields the admin search matches against."""
+
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from accounts.admin_search import SEARCH_FIELDS, search_fields
+from accounts.db import (
+    get_orders_archive_collection,
+    get_orders_collection,
+    get_referrals_collection,
+    get_users_collection,
+)
+
+
+COLLECTIONS = {
+    "users": get_users_collection,
+    "referrals": get_referrals_collection,
+    "orders": get_orders_collection,
+    "orders_archive": get_orders_archive_collection,
+}
+
+
+class Command(BaseCommand):
+    help = "Backfill the admin search fields (name_lc, email_lc, ...) in _id-ordered batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--collection", choices=sorted(COLLECTIONS), action="append",
+            help="Only backfill this collection (repeatable). Defaults to all of them.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Documents updated per bulk_write.")
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Recompute every document, not just those missing the fields.",
+        )
+
+    def handle(self, *args, **options):
+        for name in options["collection"] or list(COLLECTIONS):
+            updated = self._backfill(name, options["batch_size"], options["all"])
+            self.stdout.write(self.style.SUCCESS(f"{name}: updated {updated} documents"))
+
+    def _backfill(self, name, batch_size, everything):
+        collection = COLLECTIONS[name]()
+        fields = SEARCH_FIELDS[name]
+        projection = {source: 1 for source in fields.values()}
+        # All of a collection's fields are written together, so one marks them all.
+        query = {} if everything else {next(iter(fields)): {"$exists": False}}
+
+        updated = 0
+        last_id = None
+        while True:
+            page = dict(query)
+            if last_id is not None:
+                page["_id"] = {"$gt": last_id}
+            docs = list(collection.find(page, projection).sort("_id", 1).limit(batch_size))
+            if not docs:
+                return updated
+            collection.bulk_write(
+                [UpdateOne({"_id": doc["_id"]}, {"$set": search_fields(name, doc)}) for doc in docs],
+                ordered=False,
+            )
+            updated += len(docs)
+            last_id = docs[-1]["_id"]
+            self.stdout.write(f"{name}: {updated} documents")
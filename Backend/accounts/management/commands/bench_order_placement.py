@@ -0,0 +1,95 @@
+"""Compare per-order latency of the legacy and netted order-placement writes."""
+
+import statistics
+import time
+import uuid
+from datetime import datetime
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+from pymongo import ReturnDocument
+
+from accounts.RouterFunctions.CreateUserOrder import place_order
+from mongo.client import get_db
+from utils.request_identity import USER_PROJECTION
+
+
+def _legacy(users, orders, user_id, order_doc, coins_used, earned_points):
+    """The old sequence: read, deduct, insert, credit, re-read."""
+    users.find_one({"_id": ObjectId(user_id)})
+    if coins_used > 0:
+        users.find_one_and_update(
+            {"_id": ObjectId(user_id), "points": {"$gte": coins_used}},
+            {"$inc": {"points": -coins_used}},
+            return_document=ReturnDocument.AFTER,
+        )
+    orders.insert_one(order_doc)
+    if earned_points > 0:
+        users.find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {"points": earned_points}},
+            return_document=ReturnDocument.AFTER,
+        )
+    return users.find_one({"_id": ObjectId(user_id)}, {"points": 1}).get("points", 0)
+
+
+def _netted(users, orders, user_id, order_doc, coins_used, earned_points):
+    """CreateOrderUser without a quote token: the identity's user read, then the netted writes."""
+    users.find_one({"_id": ObjectId(user_id)}, USER_PROJECTION)
+    return place_order(users, orders, user_id, order_doc, coins_used, earned_points)
+
+
+def _order_doc(user_id):
+    return {
+        "_id": ObjectId(),
+        "order_id": str(uuid.uuid4())[:8].upper(),
+        "user_id": user_id,
+        "cart_total": 1200.0,
+        "coins_used": 10,
+        "earned_points": 48,
+        "order_items": [],
+        "status": "pending",
+        "created_at": datetime.utcnow(),
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark order placement round trips on scratch collections."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=200, help="Orders per variant.")
+        parser.add_argument("--coins", type=int, default=10, help="Coins spent per order.")
+        parser.add_argument("--earn", type=int, default=48, help="Points earned per order.")
+
+    def _run(self, label, place, users, orders, options):
+        user_id = str(users.insert_one({"name": f"bench {label}", "points": 10 ** 9}).inserted_id)
+        timings = []
+        for _ in range(options["orders"]):
+            order_doc = _order_doc(user_id)
+            started = time.perf_counter()
+            place(users, orders, user_id, order_doc, options["coins"], options["earn"])
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f"{label:<7} mean {statistics.mean(timings):7.2f} ms   "
+            f"p50 {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms"
+        )
+        return statistics.mean(timings)
+
+    def handle(self, *args, **options):
+        db = get_db()
+        suffix = uuid.uuid4().hex[:8]
+        users = db[f"bench_users_{suffix}"]
+        orders = db[f"bench_orders_{suffix}"]
+        try:
+            legacy = self._run("legacy", _legacy, users, orders, options)
+            netted = self._run("netted", _netted, users, orders, options)
+        finally:
+            users.drop()
+            orders.drop()
+
+        saved = legacy - netted
+        self.stdout.write(self.style.SUCCESS(
+            f"netted saves {saved:.2f} ms per order ({100 * saved / (legacy or 1):.0f}%)"
+        ))
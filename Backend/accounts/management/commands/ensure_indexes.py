@@ -0,0 +1,36 @@
+"""Build the Mongo indexes declared in mongo/indexes.py and verify hot queries."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mongo.client import get_db
+from mongo.indexes import ensure_indexes, verify_hot_queries
+
+
+class Command(BaseCommand):
+    help = "Create the declared Mongo indexes and fail if a hot query still scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify-only", action="store_true",
+            help="Only explain the hot queries; do not build indexes.",
+        )
+        parser.add_argument(
+            "--skip-verify", action="store_true",
+            help="Build indexes without explaining the hot queries.",
+        )
+
+    def handle(self, *args, **options):
+        db = get_db()
+        log = self.stdout.write
+
+        if not options["verify_only"]:
+            errors = ensure_indexes(db, log=log)
+            if errors:
+                raise CommandError("Index build failed:\n" + "\n".join(errors))
+
+        if not options["skip_verify"]:
+            failures = verify_hot_queries(db, log=log)
+            if failures:
+                raise CommandError("Hot queries without an index:\n" + "\n".join(failures))
+
+        self.stdout.write(self.style.SUCCESS("Indexes OK"))
@@ -0,0 +1,29 @@
+"""Run the outbox poller as its own long-lived process."""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.outbox import outbox
+
+
+class Command(BaseCommand):
+    help = "Poll the outbox and run due jobs until interrupted (pair with OUTBOX_AUTOSTART=False on web workers)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stats-every", type=int, default=60,
+            help="Print the outbox counters every this many seconds (0 to disable).",
+        )
+
+    def handle(self, *args, **options):
+        outbox.start()
+        self.stdout.write(self.style.SUCCESS(f"Outbox poller running with {outbox.workers} workers"))
+        interval = options["stats_every"]
+        try:
+            while True:
+                time.sleep(interval or 3600)
+                if interval:
+                    self.stdout.write(str(outbox.stats()))
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping outbox poller")
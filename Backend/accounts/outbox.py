@@ -0,0 +1,270 @@
+"""Durable write-behind queue for order side effects.
+
+create_order answers once the order document is written. The deferrable work
+is handled here: the confirmation mail, the order_stats counters and, with
+ORDER_DEFER_POINTS_CREDIT, crediting earned points.
+
+Jobs are persisted in the outbox collection with one insert_many per order.
+They are inserted already leased to this worker and run straight away on a
+small thread pool, so the common path needs no extra read. A failed job goes
+back to "pending" with exponential backoff. After OUTBOX_MAX_ATTEMPTS it is
+parked as "failed" for someone to look at.
+
+A poller thread claims due jobs with find_one_and_update, one at a time and
+only while the pool has free slots. It also reclaims jobs whose lease
+expired because their worker died. Finished jobs expire through a TTL index
+(mongo/indexes.py). Serving processes start the poller at boot
+(AccountsConfig.ready, OUTBOX_AUTOSTART), so backed-off retries and orphaned
+jobs run without waiting for the next order; `manage.py run_outbox` runs a
+dedicated poller instead, e.g. when gunicorn preloads the app before forking.
+
+Delivery is at least once, so handlers must tolerate a rerun. Points
+crediting records the order id on the user in the same update as the
+increment. Mail and counters accept the rare duplicate.
+"""
+
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.conf import settings
+from pymongo import ReturnDocument
+
+from Mail.mail import OrderConfirmationMail
+from mongo.client import get_collection
+from mongo.collections import outbox_col, orders_col, users_col
+from .leaderboard import leaderboard
+
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+class Outbox:
+    def __init__(self, workers=2, poll_seconds=10, lease_seconds=120,
+                 max_attempts=8, backoff_seconds=5, max_backoff_seconds=1800):
+        self.workers = max(int(workers), 1)
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._executor = None
+        self._pid = None
+        self._in_flight = 0
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the pool and poller in this process (again after a fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="outbox")
+            self._in_flight = 0
+            self._pid = os.getpid()
+            threading.Thread(target=self._poll_loop, daemon=True).start()
+
+    def _lease_until(self):
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    def enqueue(self, jobs):
+        """Persist (kind, payload) jobs and start running them here."""
+        if not jobs:
+            return
+        self.start()
+        now = datetime.utcnow()
+        docs = [
+            {
+                "_id": ObjectId(),
+                "kind": kind,
+                "payload": payload,
+                "state": "running",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "locked_until": self._lease_until(),
+                "created_at": now,
+            }
+            for kind, payload in jobs
+        ]
+        outbox_col.insert_many(docs, ordered=False)
+        for doc in docs:
+            self._submit(doc)
+
+    def _submit(self, doc):
+        with self._lock:
+            self._in_flight += 1
+        self._executor.submit(self._run, doc)
+
+    def _backoff(self, attempts):
+        delay = min(self.backoff_seconds * (2 ** (attempts - 1)), self.max_backoff_seconds)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _run(self, doc):
+        try:
+            HANDLERS[doc["kind"]](doc["payload"])
+            outbox_col.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"state": "done", "completed_at": datetime.utcnow()}, "$unset": {"locked_until": ""}},
+            )
+            self._count("completed")
+        except Exception as e:
+            attempts = doc.get("attempts", 0) + 1
+            update = {"attempts": attempts, "last_error": str(e)[:500]}
+            if attempts >= self.max_attempts:
+                update["state"] = "failed"
+                self._count("failed")
+            else:
+                update["state"] = "pending"
+                update["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=self._backoff(attempts))
+                self._count("retried")
+            logger.warning("Outbox %s attempt %s failed: %s", doc["kind"], attempts, e)
+            try:
+                outbox_col.update_one({"_id": doc["_id"]}, {"$set": update, "$unset": {"locked_until": ""}})
+            except Exception:
+                # The lease runs out and the poller picks the job up again.
+                logger.exception("Outbox update failed")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _claim(self):
+        now = datetime.utcnow()
+        return outbox_col.find_one_and_update(
+            {"$or": [
+                {"state": "pending", "next_attempt_at": {"$lte": now}},
+                {"state": "running", "locked_until": {"$lte": now}},
+            ]},
+            {"$set": {"state": "running", "locked_until": self._lease_until()}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _poll_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            try:
+                while self._in_flight < self.workers:
+                    doc = self._claim()
+                    if doc is None:
+                        break
+                    if doc["kind"] not in HANDLERS:
+                        outbox_col.update_one(
+                            {"_id": doc["_id"]},
+                            {"$set": {"state": "failed", "last_error": "No handler"}},
+                        )
+                        continue
+                    self._submit(doc)
+            except Exception:
+                logger.exception("Outbox poll failed")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "retried": self.retried,
+                "failed": self.failed,
+            }
+
+
+# ─── Handlers ────────────────────────────────────────────────────────
+
+@handler("order_confirmation_mail")
+def send_order_confirmation(payload):
+    user = users_col.find_one({"_id": ObjectId(payload["user_id"])}, {"email": 1, "name": 1})
+    if not user or not user.get("email"):
+        return
+    OrderConfirmationMail(settings, user["email"], user.get("name"), payload["order"])
+
+
+@handler("order_stats")
+def count_order(payload):
+    get_collection("order_stats").update_one(
+        {"_id": payload["day"]},
+        {"$inc": {
+            "orders": 1,
+            "items_subtotal": payload["items_subtotal"],
+            "cash_paid": payload["cash_paid"],
+            "coins_used": payload["coins_used"],
+            "earned_points": payload["earned_points"],
+        }},
+        upsert=True,
+    )
+
+
+@handler("credit_points")
+def credit_points(payload):
+    # The $inc only applies while the order is missing from the user's
+    # credited_orders, and adds it in the same update, so a rerun after any
+    # partial failure credits exactly once.
+    user = users_col.find_one_and_update(
+        {"_id": ObjectId(payload["user_id"]), "credited_orders": {"$ne": payload["order_id"]}},
+        {"$inc": {"points": payload["points"]}, "$addToSet": {"credited_orders": payload["order_id"]}},
+        projection={"points": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if user:
+        leaderboard.record(payload["user_id"], user.get("points", 0))
+    # Bookkeeping for the admin views; the user document is the source of truth.
+    orders_col.update_one({"order_id": payload["order_id"]}, {"$set": {"points_credited": True}})
+
+
+def order_side_effects(order_doc, deferred_points=0):
+    """Outbox jobs for a freshly placed order."""
+    order = {
+        field: order_doc.get(field)
+        for field in (
+            "order_id", "order_items", "shipping_fee", "coins_used",
+            "coin_discount_value", "cash_paid", "earned_points",
+        )
+    }
+    jobs = [
+        ("order_confirmation_mail", {"user_id": order_doc["user_id"], "order": order}),
+        ("order_stats", {
+            "day": order_doc["created_at"].strftime("%Y-%m-%d"),
+            "items_subtotal": order_doc.get("actual_subtotal", 0),
+            "cash_paid": order_doc.get("cash_paid", 0),
+            "coins_used": order_doc.get("coins_used", 0),
+            "earned_points": order_doc.get("earned_points", 0),
+        }),
+    ]
+    if deferred_points > 0:
+        jobs.append(("credit_points", {
+            "user_id": order_doc["user_id"],
+            "order_id": order_doc["order_id"],
+            "points": deferred_points,
+        }))
+    return jobs
+
+
+outbox = Outbox(
+    workers=getattr(settings, "OUTBOX_WORKERS", 2),
+    poll_seconds=getattr(settings, "OUTBOX_POLL_SECONDS", 10),
+    max_attempts=getattr(settings, "OUTBOX_MAX_ATTEMPTS", 8),
+)
@@ -0,0 +1,180 @@
+"""Columnar re-pricing of many carts at once.
+
+quote_batch() runs the arithmetic of calculate_order_quote over thousands of
+carts with NumPy and matches the scalar function result for result:
+
+- Line totals and every other rounded amount go through exact_round(). It
+  rounds with np.rint and redoes the few values that sit within float error
+  of a half cent with Decimal, which is how Python's round() behaves.
+- Subtotals are summed column by column as a left fold, starting from 0.0.
+  That is the same order of float additions as the scalar loop, and the zero
+  padding of shorter carts adds nothing.
+
+cross_check() re-prices a sample through the scalar function and reports
+every cart whose numbers differ. The admin what-if endpoint replays orders
+history through both the current and the proposed PricingParams.
+"""
+
+from decimal import Decimal, ROUND_HALF_EVEN
+
+import numpy as np
+
+from .RouterFunctions.CreateUserOrder import DEFAULT_PRICING, _to_float, _to_int, calculate_order_quote
+
+
+# Fields compared by cross_check(), as named in the scalar quote.
+QUOTE_FIELDS = (
+    "items_subtotal", "shipping_fee", "cart_total", "max_coins_allowed",
+    "coins_used", "coin_discount_value", "final_total", "earned_points",
+)
+
+
+def exact_round(values, digits=2):
+    """np.round that agrees with Python's round() on every float64."""
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** digits
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+
+    # Only values within float error of a half can round the other way.
+    distance = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+    tolerance = np.maximum(np.abs(scaled), 1.0) * 1e-9
+    quantum = Decimal(1).scaleb(-digits)
+    for index in np.flatnonzero(np.isfinite(values) & (distance < tolerance)):
+        exact = Decimal(float(values.flat[index])).quantize(quantum, rounding=ROUND_HALF_EVEN)
+        rounded.flat[index] = float(exact)
+    return rounded
+
+
+class CartBatch:
+    """Carts as padded (carts x max items) price and quantity columns."""
+
+    def __init__(self, prices, quantities, user_points, use_coins, keys=None):
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.quantities = np.asarray(quantities, dtype=np.int64)
+        self.user_points = np.asarray(user_points, dtype=np.int64)
+        self.use_coins = np.asarray(use_coins, dtype=bool)
+        self.keys = list(keys) if keys is not None else list(range(len(self.user_points)))
+
+    def __len__(self):
+        return len(self.user_points)
+
+    @classmethod
+    def from_carts(cls, carts):
+        """Build from (items, user_points, use_coins[, key]) tuples.
+
+        Items are read the way calculate_order_quote reads them without
+        `products`: their own `price`, and `quantity` clamped to at least 1.
+        Empty carts are skipped, as the scalar function rejects them.
+        """
+        prices, quantities, points, coins, keys = [], [], [], [], []
+        for position, cart in enumerate(carts):
+            items, user_points, use_coins = cart[:3]
+            if not items:
+                continue
+            prices.append([_to_float(item.get("price")) for item in items])
+            quantities.append([max(1, _to_int(item.get("quantity"), 1)) for item in items])
+            points.append(user_points)
+            coins.append(bool(use_coins))
+            keys.append(cart[3] if len(cart) > 3 else position)
+
+        width = max((len(row) for row in prices), default=0)
+        price_matrix = np.zeros((len(prices), width), dtype=np.float64)
+        quantity_matrix = np.zeros((len(prices), width), dtype=np.int64)
+        for row, (row_prices, row_quantities) in enumerate(zip(prices, quantities)):
+            price_matrix[row, :len(row_prices)] = row_prices
+            quantity_matrix[row, :len(row_quantities)] = row_quantities
+        return cls(price_matrix, quantity_matrix, points, coins, keys)
+
+    @classmethod
+    def from_orders(cls, orders):
+        """Historical orders, replayed with the coins they actually spent.
+
+        The balance a user had at checkout is not stored, so each order is
+        treated as if the user held exactly the coins it used.
+        """
+        return cls.from_carts(
+            (
+                order.get("order_items") or [],
+                int(order.get("coins_used") or 0),
+                bool(order.get("coins_used")),
+                str(order.get("_id")),
+            )
+            for order in orders
+        )
+
+    def cart(self, row):
+        """Row `row` as scalar calculate_order_quote arguments."""
+        items = [
+            {"price": float(price), "quantity": int(quantity)}
+            for price, quantity in zip(self.prices[row], self.quantities[row])
+            if quantity > 0
+        ]
+        return items, int(self.user_points[row]), bool(self.use_coins[row])
+
+
+def quote_batch(batch, params=None):
+    """Scalar-identical quote columns for every cart in `batch`."""
+    params = params or DEFAULT_PRICING
+
+    line_totals = exact_round(batch.prices * batch.quantities)
+    subtotal = np.zeros(len(batch), dtype=np.float64)
+    for column in range(line_totals.shape[1]):
+        subtotal = subtotal + line_totals[:, column]
+    subtotal = exact_round(subtotal)
+
+    shipping_fee = np.where(subtotal >= params.shipping_threshold, 0.0, float(params.shipping_fee))
+    cart_total = exact_round(subtotal + shipping_fee)
+
+    max_coin_discount = exact_round(cart_total * params.coin_percent)
+    max_coins_allowed = np.floor(max_coin_discount / params.coin_value).astype(np.int64)
+
+    coins_used = np.where(
+        batch.use_coins, np.minimum(np.maximum(batch.user_points, 0), max_coins_allowed), 0,
+    )
+    coin_discount_value = exact_round(coins_used * params.coin_value)
+    final_total = exact_round(np.maximum(cart_total - coin_discount_value, 0.0))
+    earned_points = np.floor((subtotal * params.earn_percent) / params.coin_value).astype(np.int64)
+
+    return {
+        "items_subtotal": subtotal,
+        "shipping_fee": exact_round(shipping_fee),
+        "cart_total": cart_total,
+        "max_coins_allowed": max_coins_allowed,
+        "coins_used": coins_used,
+        "coin_discount_value": coin_discount_value,
+        "final_total": final_total,
+        "earned_points": earned_points,
+    }
+
+
+def cross_check(batch, quotes, params=None, sample=None):
+    """Keys of carts whose batch quote differs from the scalar function."""
+    rows = range(len(batch))
+    if sample is not None and sample < len(batch):
+        rows = np.random.default_rng(0).choice(len(batch), size=sample, replace=False)
+
+    mismatches = []
+    for row in rows:
+        items, user_points, use_coins = batch.cart(row)
+        scalar = calculate_order_quote(items, user_points, use_coins=use_coins, params=params)
+        if any(scalar[field] != quotes[field][row].item() for field in QUOTE_FIELDS):
+            mismatches.append(batch.keys[row])
+    return mismatches
+
+
+def summarize(batch, quotes):
+    """Totals over a batch quote, as plain numbers for a JSON response."""
+    orders = len(batch)
+    free_shipping = int(np.count_nonzero(quotes["shipping_fee"] == 0.0))
+    return {
+        "orders": orders,
+        "items_subtotal": round(float(quotes["items_subtotal"].sum()), 2),
+        "shipping_collected": round(float(quotes["shipping_fee"].sum()), 2),
+        "free_shipping_orders": free_shipping,
+        "free_shipping_share": round(free_shipping / orders, 4) if orders else 0.0,
+        "coins_redeemed": int(quotes["coins_used"].sum()),
+        "coin_discount": round(float(quotes["coin_discount_value"].sum()), 2),
+        "revenue": round(float(quotes["final_total"].sum()), 2),
+        "points_issued": int(quotes["earned_points"].sum()),
+    }
@@ -0,0 +1,152 @@
+"""In-process n-gram index over the product catalog for admin search.
+
+Built from the cached catalog snapshot (accounts/catalog.py), so building it
+costs no Mongo reads. Every 1-, 2- and 3-character substring of the
+lower-cased name, brand and category points at the products containing it,
+so case-insensitive substring filters resolve to id sets without scanning
+the collection; longer terms intersect their trigrams and are verified
+against the stored value. When the catalog version moves, only the products
+named in the change log are re-indexed; if the log has a hole in that range
+(a concurrent bump, or rows trimmed by the TTL) the whole index is rebuilt
+from the snapshot, since patching past a hole would leave a product stale.
+
+search() returns ids in the admin listing order (name, then id); the view
+only asks Mongo for the page it is about to show.
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+
+from .catalog import catalog
+
+
+FIELDS = ("name", "brand", "category")
+GRAM = 3
+
+
+def _grams(value, size):
+    return {value[i:i + size] for i in range(len(value) - size + 1)}
+
+
+def _sort_key(product_id, name):
+    # Mongo sorts documents without a string name first.
+    return (0, "", product_id) if not isinstance(name, str) else (1, name, product_id)
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        self.version = None
+        self._values = {}                   # id -> {field: lower-cased value}
+        self._in_stock = {}                 # id -> inStock value
+        self._sort_keys = {}                # id -> sort key
+        self._order = []                    # sorted sort keys
+        self._postings = defaultdict(set)   # (field, gram) -> ids
+        self._lock = threading.Lock()
+
+    def _add(self, product):
+        product_id = product["_id"]
+        values = {}
+        for field in FIELDS:
+            value = product.get(field)
+            value = str(value).lower() if value is not None else ""
+            values[field] = value
+            for size in range(1, GRAM + 1):
+                for gram in _grams(value, size):
+                    self._postings[(field, gram)].add(product_id)
+        self._values[product_id] = values
+        self._in_stock[product_id] = product.get("inStock")
+        key = _sort_key(product_id, product.get("name"))
+        self._sort_keys[product_id] = key
+        bisect.insort(self._order, key)
+
+    def _remove(self, product_id):
+        values = self._values.pop(product_id, None)
+        if values is None:
+            return
+        for field, value in values.items():
+            for size in range(1, GRAM + 1):
+                for gram in _grams(value, size):
+                    ids = self._postings.get((field, gram))
+                    if ids is not None:
+                        ids.discard(product_id)
+                        if not ids:
+                            del self._postings[(field, gram)]
+        self._in_stock.pop(product_id, None)
+        key = self._sort_keys.pop(product_id)
+        index = bisect.bisect_left(self._order, key)
+        del self._order[index]
+
+    def _rebuild(self, snapshot):
+        self._values.clear()
+        self._in_stock.clear()
+        self._sort_keys.clear()
+        self._order = []
+        self._postings.clear()
+        for product in snapshot.products:
+            if "_id" in product:
+                self._add(product)
+
+    def sync(self):
+        """Bring the index up to the current catalog version."""
+        snapshot = catalog.snapshot()
+        if snapshot.version == self.version:
+            return
+        with self._lock:
+            if snapshot.version == self.version:
+                return
+            changes = None
+            if self.version is not None:
+                changes = catalog.changes_since(self.version, snapshot)
+            if changes is None:
+                # No contiguous change set from our version: start over.
+                self._rebuild(snapshot)
+            else:
+                for product_id in changes:
+                    self._remove(product_id)
+                    product = snapshot.by_id.get(product_id)
+                    if product is not None:
+                        self._add(product)
+            self.version = snapshot.version
+
+    def _matching(self, field, term):
+        """Ids whose `field` contains `term`, case-insensitively."""
+        term = term.lower()
+        if len(term) <= GRAM:
+            return set(self._postings.get((field, term), ()))
+        grams = sorted(_grams(term, GRAM), key=lambda g: len(self._postings.get((field, g), ())))
+        candidates = set(self._postings.get((field, grams[0]), ()))
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            candidates &= self._postings.get((field, gram), set())
+        return {pid for pid in candidates if term in self._values[pid][field]}
+
+    def search(self, search="", category="", brand="", in_stock=None, keys=False):
+        """Ids matching every given filter, in (name, id) order; with
+        keys=True the full sort keys, whose last element is the id."""
+        self.sync()
+        with self._lock:
+            matched = None
+            if category:
+                matched = self._matching("category", category)
+            if brand:
+                ids = self._matching("brand", brand)
+                matched = ids if matched is None else matched & ids
+            if in_stock is not None:
+                ids = {pid for pid, value in self._in_stock.items() if value is in_stock}
+                matched = ids if matched is None else matched & ids
+            if search:
+                ids = set()
+                for field in FIELDS:
+                    ids |= self._matching(field, search)
+                matched = ids if matched is None else matched & ids
+
+            if matched is None:
+                ordered = list(self._order)
+            else:
+                ordered = sorted(self._sort_keys[pid] for pid in matched)
+            return ordered if keys else [key[-1] for key in ordered]
+
+
+product_search = ProductSearchIndex()
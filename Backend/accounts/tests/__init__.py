@@ -0,0 +1,26 @@
+"""Behaviour tests for the order, paging and pricing paths.
+
+Run with `python manage.py test accounts`. Every test talks to an in-memory
+mongomock client (requirements-dev.txt), never to MONGO_URI: it is installed
+here, before any module binds its collections through mongo.client.
+"""
+
+import unittest
+
+from django.test.utils import override_settings
+
+try:
+    import mongomock
+except ImportError:
+    raise unittest.SkipTest("mongomock is not installed (pip install -r requirements-dev.txt)")
+
+from mongo import client
+
+
+override_settings(MONGO_DB_NAME="backend_tests").enable()
+client._client = mongomock.MongoClient()
+
+
+def clear(*collections):
+    for collection in collections:
+        collection.delete_many({})
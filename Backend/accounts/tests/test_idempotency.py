@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase
+
+from accounts import idempotency
+from accounts.idempotency import IdempotencyError, claim, complete, mark_placed, release, renew
+from mongo.collections import idempotency_col
+
+from . import clear
+
+
+USER = "64b000000000000000000001"
+DATA = {"items": [{"productId": "p1", "quantity": 2}], "use_coins": True}
+
+
+class IdempotencyTests(SimpleTestCase):
+    def setUp(self):
+        clear(idempotency_col)
+
+    def assertStatus(self, status, *args, **kwargs):
+        with self.assertRaises(IdempotencyError) as caught:
+            claim(*args, **kwargs)
+        self.assertEqual(caught.exception.status, status)
+
+    def expire_lease(self, key):
+        idempotency_col.update_one(
+            {"_id": f"{USER}:{key}"}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}},
+        )
+
+    def test_replays_the_stored_response(self):
+        self.assertIsNone(claim(USER, "k1", DATA, "lease-a"))
+        complete(USER, "k1", 201, {"success": True, "order_id": "AB12"})
+        self.assertEqual(claim(USER, "k1", DATA, "lease-b"), (201, {"success": True, "order_id": "AB12"}))
+        self.assertEqual(claim(USER, "k1", dict(DATA), "lease-c"), (201, {"success": True, "order_id": "AB12"}))
+
+    def test_in_progress_and_reused_keys(self):
+        claim(USER, "k1", DATA, "lease-a")
+        self.assertStatus(409, USER, "k1", DATA, "lease-b")
+        self.assertStatus(422, USER, "k1", {**DATA, "use_coins": False}, "lease-b")
+        # Keys are per user.
+        self.assertIsNone(claim("64b000000000000000000002", "k1", DATA, "lease-b"))
+
+    def test_release_lets_the_client_retry(self):
+        claim(USER, "k1", DATA, "lease-a")
+        release(USER, "k1", "lease-a")
+        self.assertIsNone(claim(USER, "k1", DATA, "lease-b"))
+
+    def test_expired_lease_is_taken_over_and_fences_the_old_holder(self):
+        claim(USER, "k1", DATA, "lease-a")
+        renew(USER, "k1", "lease-a")
+        self.expire_lease("k1")
+
+        self.assertIsNone(claim(USER, "k1", DATA, "lease-b"))
+        with self.assertRaises(IdempotencyError) as caught:
+            renew(USER, "k1", "lease-a")
+        self.assertEqual(caught.exception.status, 409)
+        renew(USER, "k1", "lease-b")
+
+        # The old holder's cleanup must not free the new holder's key.
+        release(USER, "k1", "lease-a")
+        self.assertStatus(409, USER, "k1", DATA, "lease-c")
+        release(USER, "k1", "lease-b")
+        self.assertIsNone(claim(USER, "k1", DATA, "lease-c"))
+
+    def test_placed_key_is_never_taken_over_or_released(self):
+        claim(USER, "k1", DATA, "lease-a")
+        mark_placed(USER, "k1", "AB12")
+        self.expire_lease("k1")
+        release(USER, "k1", "lease-a")
+        self.assertStatus(409, USER, "k1", DATA, "lease-b")
+        with self.assertRaises(IdempotencyError):
+            renew(USER, "k1", "lease-a")
+
+    def test_lease_outlasts_the_socket_timeout(self):
+        with self.settings(IDEMPOTENCY_LEASE_SECONDS=5, MONGO_SOCKET_TIMEOUT_MS=20000):
+            self.assertEqual(idempotency.lease_seconds(), 40)
+        with self.settings(IDEMPOTENCY_LEASE_SECONDS=90, MONGO_SOCKET_TIMEOUT_MS=20000):
+            self.assertEqual(idempotency.lease_seconds(), 90)
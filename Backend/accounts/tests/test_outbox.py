@@ -0,0 +1,72 @@
+from datetime import datetime
+from unittest import mock
+
+from bson import ObjectId
+from django.test import SimpleTestCase
+from pymongo.errors import AutoReconnect
+
+from accounts import outbox as outbox_module
+from accounts.outbox import HANDLERS, Outbox, credit_points
+from mongo.collections import orders_col, outbox_col, users_col
+
+from . import clear
+
+
+class CreditPointsTests(SimpleTestCase):
+    def setUp(self):
+        clear(users_col, orders_col, outbox_col)
+        self.user_id = users_col.insert_one({"name": "Asha", "points": 100}).inserted_id
+        orders_col.insert_one({"order_id": "AB12", "user_id": str(self.user_id)})
+        self.payload = {"user_id": str(self.user_id), "order_id": "AB12", "points": 40}
+        leaderboard = mock.patch.object(outbox_module, "leaderboard")
+        self.leaderboard = leaderboard.start()
+        self.addCleanup(leaderboard.stop)
+
+    def points(self):
+        return users_col.find_one({"_id": self.user_id})["points"]
+
+    def test_rerun_credits_once(self):
+        credit_points(self.payload)
+        credit_points(self.payload)
+        self.assertEqual(self.points(), 140)
+        self.assertEqual(users_col.find_one({"_id": self.user_id})["credited_orders"], ["AB12"])
+        self.assertTrue(orders_col.find_one({"order_id": "AB12"})["points_credited"])
+        self.leaderboard.record.assert_called_once_with(str(self.user_id), 140)
+
+    def test_orders_are_credited_independently(self):
+        orders_col.insert_one({"order_id": "CD34", "user_id": str(self.user_id)})
+        credit_points(self.payload)
+        credit_points({**self.payload, "order_id": "CD34", "points": 10})
+        self.assertEqual(self.points(), 150)
+
+    def test_job_rerun_after_partial_failure(self):
+        """The credit lands, the order update fails; the retried job must not credit again."""
+        box = Outbox(max_attempts=3, backoff_seconds=0)
+        job = {"_id": ObjectId(), "kind": "credit_points", "payload": self.payload, "state": "running",
+               "attempts": 0, "next_attempt_at": datetime.utcnow(), "created_at": datetime.utcnow()}
+        outbox_col.insert_one(job)
+
+        with mock.patch.object(
+            outbox_module.orders_col, "update_one", side_effect=AutoReconnect("connection reset"),
+        ), self.assertLogs("accounts.outbox", "WARNING"):
+            box._run(job)
+        self.assertEqual(self.points(), 140)
+        failed = outbox_col.find_one({"_id": job["_id"]})
+        self.assertEqual((failed["state"], failed["attempts"]), ("pending", 1))
+        self.assertIn("connection reset", failed["last_error"])
+
+        box._run(failed)
+        self.assertEqual(self.points(), 140)
+        self.assertEqual(outbox_col.find_one({"_id": job["_id"]})["state"], "done")
+        self.assertTrue(orders_col.find_one({"order_id": "AB12"})["points_credited"])
+        self.assertEqual((box.retried, box.completed), (1, 1))
+
+    def test_job_is_parked_after_max_attempts(self):
+        box = Outbox(max_attempts=2, backoff_seconds=0)
+        job = {"_id": ObjectId(), "kind": "explode", "payload": {}, "attempts": 1}
+        outbox_col.insert_one(dict(job, state="running"))
+        with mock.patch.dict(HANDLERS, explode=mock.Mock(side_effect=RuntimeError("boom"))), \
+                self.assertLogs("accounts.outbox", "WARNING"):
+            box._run(job)
+        self.assertEqual(outbox_col.find_one({"_id": job["_id"]})["state"], "failed")
+        self.assertEqual(box.failed, 1)
@@ -0,0 +1,100 @@
+import base64
+from datetime import datetime, timedelta
+
+from bson import ObjectId, json_util
+from django.test import SimpleTestCase
+
+from accounts.archive import merged_finder
+from accounts.db import get_orders_archive_collection, get_orders_collection
+from utils.pagination import decode_cursor, encode_cursor, keyset_window, slice_window
+
+from . import clear
+
+
+def raw_cursor(payload):
+    raw = json_util.dumps(payload).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def walk(collection, query, limit, find=None):
+    """Every page forward, then every page back from the last one."""
+    pages, cursor = [], None
+    while True:
+        docs, next_cursor, prev_cursor = keyset_window(collection, query, "created_at", limit, cursor, find=find)
+        pages.append(([doc["_id"] for doc in docs], prev_cursor))
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+
+    back, cursor = [], pages[-1][1]
+    while cursor:
+        docs, _, cursor = keyset_window(collection, query, "created_at", limit, cursor, find=find)
+        back.append([doc["_id"] for doc in docs])
+    return [ids for ids, _ in pages], back
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        doc_id = ObjectId()
+        at = datetime(2025, 3, 1, 12, 30, 15, 123000)
+        self.assertEqual(decode_cursor(encode_cursor(at, doc_id)), (at, doc_id, False))
+        self.assertEqual(decode_cursor(encode_cursor(["whey", 42], None, backward=True)), (["whey", 42], None, True))
+
+    def test_rejects_tampered_cursors(self):
+        for cursor in [
+            "not base64!", raw_cursor({"value": 1}), raw_cursor([1]), raw_cursor([1, 2, 3, 4]),
+            raw_cursor([{"$gt": ""}, "x"]), raw_cursor(["x", {"$ne": None}]), raw_cursor([[{"$gt": 1}], None]),
+        ]:
+            with self.assertRaises(ValueError, msg=cursor):
+                decode_cursor(cursor)
+
+    def test_slice_window(self):
+        keys = [(name,) for name in "abcdefg"]
+        start, end, next_cursor, prev_cursor = slice_window(keys, 3)
+        self.assertEqual((start, end, prev_cursor), (0, 3, None))
+        start, end, next_cursor, prev_cursor = slice_window(keys, 3, next_cursor)
+        self.assertEqual((start, end), (3, 6))
+        self.assertEqual(slice_window(keys, 3, prev_cursor)[:2], (0, 3))
+
+
+class KeysetWindowTests(SimpleTestCase):
+    def setUp(self):
+        self.orders = get_orders_collection()
+        self.archive = get_orders_archive_collection()
+        clear(self.orders, self.archive)
+        start = datetime(2025, 1, 1)
+        # Pairs of orders share a created_at, so pages have to break ties on _id.
+        self.docs = [
+            {"_id": ObjectId(), "user_id": "u1", "created_at": start + timedelta(hours=index // 2)}
+            for index in range(23)
+        ]
+        self.docs.append({"_id": ObjectId(), "user_id": "u2", "created_at": start})
+
+    def expected(self):
+        mine = [doc for doc in self.docs if doc["user_id"] == "u1"]
+        return [doc["_id"] for doc in sorted(mine, key=lambda doc: (doc["created_at"], doc["_id"]), reverse=True)]
+
+    def assertPages(self, forward, back, limit):
+        expected = self.expected()
+        self.assertEqual([doc_id for page in forward for doc_id in page], expected)
+        self.assertTrue(all(len(page) == limit for page in forward[:-1]))
+        self.assertEqual(list(reversed(back)), forward[:-1])
+
+    def test_pages_one_collection(self):
+        self.orders.insert_many(self.docs)
+        forward, back = walk(self.orders, {"user_id": "u1"}, 5)
+        self.assertPages(forward, back, 5)
+
+    def test_pages_across_orders_and_archive(self):
+        self.orders.insert_many(self.docs[::2])
+        self.archive.insert_many(self.docs[1::2])
+        # A document caught between the archive copy and the delete is in both.
+        self.archive.insert_one(dict(self.docs[4]))
+        forward, back = walk(self.orders, {"user_id": "u1"}, 4, find=merged_finder())
+        self.assertPages(forward, back, 4)
+
+    def test_empty_and_last_page(self):
+        self.assertEqual(keyset_window(self.orders, {"user_id": "u1"}, "created_at", 5), ([], None, None))
+        self.orders.insert_many(self.docs[:3])
+        docs, next_cursor, prev_cursor = keyset_window(self.orders, {"user_id": "u1"}, "created_at", 3)
+        self.assertEqual((len(docs), next_cursor, prev_cursor), (3, None, None))
@@ -0,0 +1,61 @@
+import random
+
+from django.test import SimpleTestCase
+
+from accounts.pricing_batch import QUOTE_FIELDS, CartBatch, cross_check, exact_round, quote_batch
+from accounts.RouterFunctions.CreateUserOrder import PricingParams, calculate_order_quote
+
+
+def random_carts(count, seed=7):
+    rng = random.Random(seed)
+    carts = []
+    for position in range(count):
+        items = [
+            {
+                # Whole, half-cent and odd prices, so rounding ties come up.
+                "price": rng.choice([rng.randint(1, 3000), rng.randint(1, 300000) / 100, rng.randint(1, 6000) / 200]),
+                "quantity": rng.randint(0, 6),
+            }
+            for _ in range(rng.randint(1, 6))
+        ]
+        carts.append((items, rng.randint(0, 800), rng.random() < 0.6, position))
+    return carts
+
+
+class ExactRoundTests(SimpleTestCase):
+    def test_matches_python_round(self):
+        values = [2.675, 1.005, 0.125, 0.375, 2.5, -1.125, 1234.565, 0.0, 1e-9, 99999.995]
+        rng = random.Random(1)
+        values += [rng.randint(0, 10 ** 7) / 1000 for _ in range(2000)]
+        self.assertEqual(exact_round(values).tolist(), [round(value, 2) for value in values])
+
+
+class QuoteBatchTests(SimpleTestCase):
+    def assertMatchesScalar(self, carts, params=None):
+        batch = CartBatch.from_carts(carts)
+        quotes = quote_batch(batch, params)
+        self.assertEqual(cross_check(batch, quotes, params), [])
+        for row, (items, user_points, use_coins, _) in enumerate(carts):
+            scalar = calculate_order_quote(items, user_points, use_coins=use_coins, params=params)
+            for field in QUOTE_FIELDS:
+                self.assertEqual(quotes[field][row].item(), scalar[field], (row, field))
+
+    def test_default_pricing_matches_scalar_quote(self):
+        self.assertMatchesScalar(random_carts(500))
+
+    def test_custom_pricing_matches_scalar_quote(self):
+        params = PricingParams(
+            shipping_threshold=750, shipping_fee=49, coin_percent=0.15, coin_value=0.5, earn_percent=0.03,
+        )
+        self.assertMatchesScalar(random_carts(500, seed=11), params)
+
+    def test_from_orders_skips_empty_orders_and_keeps_ids(self):
+        orders = [
+            {"_id": "a", "order_items": [{"price": 100, "quantity": 2}], "coins_used": 5},
+            {"_id": "b", "order_items": []},
+            {"_id": "c", "order_items": [{"price": "12.5", "quantity": "x"}], "coins_used": 0},
+        ]
+        batch = CartBatch.from_orders(orders)
+        self.assertEqual(batch.keys, ["a", "c"])
+        self.assertEqual(batch.cart(1), ([{"price": 12.5, "quantity": 1}], 0, False))
+        self.assertEqual(cross_check(batch, quote_batch(batch)), [])
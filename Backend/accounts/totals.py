@@ -0,0 +1,116 @@
+"""Totals for the paginated admin listings without a count per page flip.
+
+- Unfiltered totals come from estimated_document_count(), which reads
+  collection metadata instead of counting.
+- Filtered totals are counted once and then served from a process-local
+  cache for ADMIN_TOTALS_TTL_SECONDS. The cache key is the collection plus
+  the query serialized with sorted keys, so the same filter hits the same
+  entry.
+- With exact_total=false a filtered count stops after ADMIN_TOTALS_CAP
+  matches, and the response reports "more than N" instead of a number.
+
+Totals may lag a write by up to the TTL, which is fine for a page count.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from bson import json_util
+from django.conf import settings
+
+
+class Total:
+    __slots__ = ("count", "exact", "capped")
+
+    def __init__(self, count, exact=True, capped=False):
+        self.count = count
+        self.exact = exact
+        self.capped = capped
+
+    def __add__(self, other):
+        return Total(self.count + other.count, self.exact and other.exact, self.capped or other.capped)
+
+    def pagination(self, page, page_size):
+        """The page-number `pagination` block for an admin list response."""
+        body = {
+            "total": self.count,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (self.count + page_size - 1) // page_size,
+        }
+        if not self.exact:
+            body["total_exact"] = False
+        if self.capped:
+            body["more_than"] = self.count
+        return body
+
+
+class TotalsCache:
+    """Bounded LRU of (collection, query, cap) -> Total with a fixed TTL."""
+
+    def __init__(self, ttl=30, max_entries=1024, cap=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cap = cap
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(collection, query, cap):
+        return (collection.full_name, json_util.dumps(query, sort_keys=True), cap)
+
+    def _get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            total, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return total
+
+    def _set(self, key, total):
+        with self._lock:
+            self._entries[key] = (total, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def total(self, collection, query, exact=True, max_time_ms=None):
+        """Total for `query`; with exact=False counting stops after `cap`."""
+        cap = None if exact else self.cap
+        key = self._key(collection, query, cap)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        options = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+        if not query:
+            # Collection metadata; only off after an unclean shutdown.
+            total = Total(collection.estimated_document_count())
+        elif cap is None:
+            total = Total(collection.count_documents(query, **options))
+        else:
+            count = collection.count_documents(query, limit=cap + 1, **options)
+            total = Total(min(count, cap), exact=count <= cap, capped=count > cap)
+        self._set(key, total)
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+totals = TotalsCache(
+    ttl=getattr(settings, "ADMIN_TOTALS_TTL_SECONDS", 30),
+    max_entries=getattr(settings, "ADMIN_TOTALS_MAX_ENTRIES", 1024),
+    cap=getattr(settings, "ADMIN_TOTALS_CAP", 1000),
+)
+
+
+def exact_total(request):
+    return request.query_params.get("exact_total", "").lower() not in ("0", "false", "no")
@@ -13,8 +13,10 @@ urlpatterns = [
     path("profile/", views.ProfileView.as_view(), name="profile"),
     path("referrals/", views.MyReferralsView.as_view(), name="my_referrals"),
     path("leaderboard/", views.LeaderboardView.as_view(), name="leaderboard"),
+    path("leaderboard/me/", views.LeaderboardMeView.as_view(), name="leaderboard_me"),
     path('profileForOrderPlaced/', views.profile_view, name='profile'),
     path('orders/quote/', views.order_quote, name='order_quote'),
+    path('orders/mine/', views.MyOrdersView.as_view(), name='my_orders'),
     path('orders/', views.create_order, name='create_order'),
 
     path('auth/forgot-password/', views.forgot_password, name='forgot_password'),
@@ -2,7 +2,8 @@ from datetime import datetime
 from bson import ObjectId
 from bson.errors import InvalidId
 
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
+from django.utils.cache import patch_vary_headers
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -18,7 +19,7 @@ import os
 from dotenv import load_dotenv
 from mongo.collections import users_col, referrals_col
 from Mail.mail import MailFunction
-from utils.password import hash_password, verify_password
+from utils.password import hash_password, verify_password, PasswordHashingBusy
 from utils.jwt import generate_tokens_for_user
 from utils.jwt_helper import decode_token
 from django.core.mail import EmailMultiAlternatives
@@ -29,20 +30,28 @@ from datetime import datetime, timedelta
 from mongo.collections import users_col, otps_col
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.decorators import api_view, permission_classes
-from .db import get_products_collection
+from .catalog import catalog
+from . import idempotency
 
 
 from .RouterFunctions.Signup import signup_logic
 from .RouterFunctions.login import LoginLogic
 from .RouterFunctions.ProfileShowForRefferPoint import ProfileForRefferal
 from .RouterFunctions.Refferal import get_my_referrals
-from .RouterFunctions.CreateUserOrder import CreateOrderUser, calculate_order_quote, get_user_id_from_auth
+from .RouterFunctions.CreateUserOrder import CreateOrderUser, calculate_order_quote, resolve_cart_products
 from .RouterFunctions.ForgotPassword import FPassword
 from .RouterFunctions.ResetPassword import RPassword
 from .RouterFunctions.VerifyOTP import VOtp
 from .RouterFunctions.ProfileView import ProfiView
 from .RouterFunctions.LboardView import board
+from .leaderboard import leaderboard
+from .admin_search import SEARCH_FIELDS
+from .archive import merged_finder
 from utils.CuJWTAuthenticat import CustomJWTAuthentication
+from utils.token_cache import invalidate_user_tokens
+from utils.request_identity import get_identity
+from utils.quote_token import issue_quote_token, quote_token_ttl
+from utils.pagination import keyset_window, page_limit
 # .................................................. UserAccount Portion ...........................................
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -217,9 +226,12 @@ class ChangePasswordView(APIView):
                 {"_id": ObjectId(str(user_id))}, 
                 {"$set": {"password": new_hashed, "updated_at": datetime.utcnow()}}
             )
+            invalidate_user_tokens(user_id)
             
             return Response({"message": "Password changed successfully"})
             
+        except PasswordHashingBusy:
+            return Response({"error": "Server busy, please retry"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             #print(f"Change Password ERROR: {str(e)}")
             #print(traceback.format_exc())
@@ -267,20 +279,63 @@ def wake_up(request):
     return JsonResponse({"status": "backend awake"})
 
 
+def _preferred_encoding(accept_encoding, available):
+    """Pick br, then gzip, then identity from an Accept-Encoding header."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def products_public(request):
-    """Public read-only products endpoint for frontend runtime sync."""
+    """Public read-only products endpoint for frontend runtime sync.
+
+    `?since=<version>` returns only the products changed after that version
+    (`upserts`) and the ids of deleted ones (`deletes`); when the change log
+    cannot cover the gap the full catalog is returned with `full: true`.
+    """
     try:
-        collection = get_products_collection()
-        products = list(collection.find({}))
-        for product in products:
-            if "_id" in product:
-                product["_id"] = str(product["_id"])
-            if "id" in product:
-                product["id"] = str(product["id"])
-
-        return Response({"success": True, "data": products}, status=status.HTTP_200_OK)
+        since = request.query_params.get("since")
+        if since is not None:
+            try:
+                delta = catalog.delta(int(since))
+            except ValueError:
+                delta = None
+            if delta is not None:
+                return Response(
+                    {"success": True, "full": False, **delta},
+                    status=status.HTTP_200_OK,
+                )
+
+        snapshot = catalog.snapshot()
+        encoding = _preferred_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""), snapshot.encodings
+        )
+        body, etag = snapshot.body(encoding)
+
+        if snapshot.matches(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type="application/json")
+            response["Content-Length"] = str(len(body))
+            if encoding != "identity":
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
     except Exception as exc:
         return Response(
             {"success": False, "data": [], "error": str(exc)},
@@ -330,6 +385,12 @@ class SignupView(APIView):
                 "success": False,
                 "error": str(ve)
             }, status=400)
+
+        except PasswordHashingBusy:
+            return Response({
+                "success": False,
+                "error": "Server busy, please retry"
+            }, status=503)
             
         except Exception as e:
             print(f"Signup error: {str(e)}")
@@ -349,8 +410,10 @@ class LoginView(APIView):
         phone = request.data.get("phone")
         password = request.data.get("password")
 
-        tokens, user = LoginLogic(phone, password)
-
+        result = LoginLogic(phone, password)
+        if isinstance(result, Response):
+            return result
+        tokens, user = result
 
         return Response({
             "user": {
@@ -374,7 +437,7 @@ class ProfileView(APIView):
             return Response({"detail": "Unauthorized"}, status=401)
 
         try:
-            user = ProfileForRefferal(auth)
+            user = ProfileForRefferal(get_identity(request))
 
             return Response({
                 "id": str(user["_id"]),
@@ -394,8 +457,7 @@ class ProfileView(APIView):
 class MyReferralsView(APIView):
     def get(self, request):
         try:
-            auth = request.headers.get("Authorization")
-            referrals = get_my_referrals(auth)  
+            referrals = get_my_referrals(get_identity(request))  
             return Response(referrals, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -408,9 +470,87 @@ class LeaderboardView(APIView):
     permission_classes = [AllowAny]
     
     def get(self, request):
-            print('Leaderboard requested...')
-            users_cursor = users_col.find().sort("points", -1).limit(50)
-            return board(users_cursor)
+            return board(lambda: leaderboard.top(50))
+
+
+class LeaderboardMeView(APIView):
+    authentication_classes = [CustomJWTAuthentication]
+
+    def get(self, request):
+        if not isinstance(request.user, dict) or 'id' not in request.user:
+            return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            standing = leaderboard.standing(request.user['id'])
+            if not standing:
+                return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            def entry(u):
+                return {
+                    "id": str(u["_id"]),
+                    "name": u.get("name", "Anonymous") or "Anonymous",
+                    "points": u.get("points", 0),
+                }
+
+            return Response({
+                "rank": standing["rank"],
+                "points": standing["points"],
+                "percentile": standing["percentile"],
+                "total_users": standing["total_users"],
+                "neighbours": {
+                    "above": [entry(u) for u in standing["above"]],
+                    "below": [entry(u) for u in standing["below"]],
+                },
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            print(f"Leaderboard rank ERROR: {str(e)}")
+            return Response({"error": "Failed to load rank"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class MyOrdersView(APIView):
+    """The signed-in user's orders, newest first, one keyset page at a time.
+
+    Pages span orders and orders_archive, so delivered and cancelled orders
+    stay in the history after `archive_orders` moves them.
+    """
+    authentication_classes = [CustomJWTAuthentication]
+
+    # Summary fields only; line items are sent when include_items is set.
+    # The admin search copies (*_lc) and archive bookkeeping stay internal.
+    INTERNAL_FIELDS = {field: 0 for field in SEARCH_FIELDS["orders"]}
+    INTERNAL_FIELDS["archived_at"] = 0
+    SUMMARY_PROJECTION = {"user_id": 0, "order_items": 0, "utr_number": 0, **INTERNAL_FIELDS}
+    ITEMS_PROJECTION = {"user_id": 0, "utr_number": 0, **INTERNAL_FIELDS}
+
+    def get(self, request):
+        if not isinstance(request.user, dict) or 'id' not in request.user:
+            return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        include_items = request.query_params.get('include_items', '').lower() in ('1', 'true', 'yes')
+        limit = page_limit(request.query_params.get('limit'), default=10, maximum=50)
+        try:
+            orders, next_cursor, _ = keyset_window(
+                orders_col,
+                {"user_id": request.user['id']},
+                "created_at",
+                limit,
+                cursor=request.query_params.get('cursor'),
+                projection=self.ITEMS_PROJECTION if include_items else self.SUMMARY_PROJECTION,
+                find=merged_finder(),
+            )
+        except ValueError as ve:
+            return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            print(f"My orders ERROR: {str(e)}")
+            return Response({"error": "Failed to load orders"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        for order in orders:
+            order["id"] = str(order.pop("_id"))
+        return Response({
+            "orders": orders,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+        }, status=status.HTTP_200_OK)
             
 
 
@@ -431,20 +571,22 @@ from rest_framework.response import Response
 @api_view(['POST'])
 def order_quote(request):
     try:
-        auth_header = request.headers.get('Authorization')
+        identity = get_identity(request)
         data = request.data
 
-        if not auth_header or not auth_header.startswith('Bearer '):
+        if not identity.has_bearer:
             return Response({'error': 'Token required'}, status=401)
 
-        user_id = get_user_id_from_auth(auth_header)
-        user = users_col.find_one({"_id": ObjectId(user_id)})
+        user = identity.user
         if not user:
             return Response({'error': 'User not found'}, status=404)
 
         items = data.get("items", [])
         use_coins = bool(data.get("use_coins", False))
-        quote = calculate_order_quote(items, user.get("points", 0), use_coins=use_coins)
+        quote = calculate_order_quote(
+            items, user.get("points", 0), use_coins=use_coins,
+            products=resolve_cart_products(items),
+        )
 
         return Response(
             {
@@ -462,6 +604,8 @@ def order_quote(request):
                     "coin_value": quote["coin_value"],
                     "coin_percent": quote["coin_percent"],
                     "earned_points": quote["earned_points"],
+                    "quote_token": issue_quote_token(identity.user_id, quote, user.get("name")),
+                    "quote_expires_in": int(quote_token_ttl().total_seconds()),
                 },
             },
             status=200,
@@ -474,23 +618,61 @@ def order_quote(request):
 
 @api_view(['POST'])
 def create_order(request):
+    claimed_key = None
+    placed_key = None
+    lease_id = uuid.uuid4().hex
+
+    def before_place():
+        # Fencing: make sure no retry took the key over while we were pricing.
+        if claimed_key:
+            idempotency.renew(identity.user_id, claimed_key, lease_id)
+
+    def order_placed(order_id):
+        # The order is stored: from here on the key must never be released.
+        nonlocal claimed_key, placed_key
+        placed_key, claimed_key = claimed_key, None
+        if placed_key:
+            try:
+                idempotency.mark_placed(identity.user_id, placed_key, order_id)
+            except Exception as e:
+                print(f"Idempotency mark_placed ERROR: {str(e)}")
+
     try:
-        auth_header = request.headers.get('Authorization')
+        identity = get_identity(request)
         data = request.data
         
-        if not auth_header or not auth_header.startswith('Bearer '):
+        if not identity.has_bearer:
             return Response({'error': 'Token required'}, status=401)
+        # Decode the token before touching the key: a bad token is a 401, not a 500.
+        try:
+            user_id = identity.user_id
+        except Exception as e:
+            return Response({'error': str(e)}, status=401)
+        if not user_id:
+            return Response({'error': 'Invalid token'}, status=401)
+
+        idempotency_key = idempotency.request_key(request)
+        if idempotency_key:
+            stored = idempotency.claim(identity.user_id, idempotency_key, data, lease_id)
+            if stored is not None:
+                stored_status, stored_body = stored
+                response = Response(stored_body, status=stored_status)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+            claimed_key = idempotency_key
         
         order_id, earned_points, new_points, quote = CreateOrderUser(
-            auth_header, 
+            identity, 
             data, 
             users_col, 
-            orders_col
+            orders_col,
+            before_place=before_place,
+            on_placed=order_placed,
         )
         
         print(f"✅ Order {order_id} created! Earned: {earned_points}, New points: {new_points}")
         
-        return Response({
+        body = {
             'order': {
                 'id': order_id,
                 'earnedPoints': earned_points,
@@ -507,7 +689,17 @@ def create_order(request):
             'user': {
                 'points': new_points         
             }
-        }, status=201)
+        }
+        if placed_key:
+            try:
+                idempotency.complete(identity.user_id, placed_key, 201, body)
+            except Exception as e:
+                # The order stands; a retry gets 409 instead of a second order.
+                print(f"Idempotency complete ERROR: {str(e)}")
+        return Response(body, status=201)
+
+    except idempotency.IdempotencyError as ie:
+        return Response({'error': str(ie)}, status=ie.status)
         
     except ValueError as ve:
         print(f"Validation error: {str(ve)}")
@@ -521,6 +713,15 @@ def create_order(request):
             'detail': 'Order creation failed'
         }, status=500)
 
+    finally:
+        # Only reached with a claimed key before the order was stored; let the
+        # client retry with the same key.
+        if claimed_key:
+            try:
+                idempotency.release(identity.user_id, claimed_key, lease_id)
+            except Exception as e:
+                print(f"Idempotency release ERROR: {str(e)}")
+
 
 
 
@@ -530,7 +731,7 @@ def create_order(request):
 # ................................................ profile_view .............................................
 @api_view(['GET'])
 def profile_view(request):
-    return ProfiView(request, users_col)
+    return ProfiView(get_identity(request))
 
 
 
@@ -3,12 +3,13 @@ API Views for SSSupplement Admin Backend.
 Full CRUD for Users, Referrals, Orders, Products + Auth.
 """
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import functools
 import os
 from bson import ObjectId
 from bson.errors import InvalidId
-from pymongo.errors import PyMongoError
-import bcrypt
+from pymongo import ReturnDocument, UpdateMany
+from pymongo.errors import ExecutionTimeout, PyMongoError
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -20,6 +21,7 @@ from .db import (
     get_users_collection,
     get_referrals_collection,
     get_orders_collection,
+    get_orders_archive_collection,
     get_products_collection,
     get_admins_collection,
 )
@@ -31,6 +33,41 @@ from .serializers_admin import (
     LoginSerializer,
 )
 from .authentication import generate_token, AdminJWTAuthentication
+from utils.token_cache import invalidate_user_tokens
+from utils.password import hash_password, verify_password, needs_rehash, hashing_stats, PasswordHashingBusy
+from mongo.client import pool_stats
+from .leaderboard import leaderboard
+from .outbox import outbox
+from .admin_search import (
+    ORDER_SEARCH, REFERRAL_SEARCH, SEARCH_FIELD_NAMES, USER_SEARCH, compile_search, search_fields,
+    search_fields_for_update, search_max_time_ms,
+)
+from .archive import archive_stats, include_archived, merged_find, merged_finder
+from .totals import exact_total, totals
+from utils.pagination import cursor_mode, keyset_window, page_limit, slice_window
+from .catalog import catalog
+from .product_search import product_search
+from .order_ids import new_order_id, normalize as normalize_order_id
+from .pricing_batch import CartBatch, cross_check, quote_batch, summarize
+from .RouterFunctions.CreateUserOrder import DEFAULT_PRICING, PricingParams
+
+
+# Allowed order status moves; the bulk status endpoint enforces them.
+ORDER_TRANSITIONS = {
+    'pending': {'confirmed', 'cancelled'},
+    'confirmed': {'shipped', 'cancelled'},
+    'shipped': {'delivered'},
+    'delivered': set(),
+    'cancelled': set(),
+}
+BULK_STATUS_MAX_ORDERS = getattr(settings, 'BULK_STATUS_MAX_ORDERS', 1000)
+BULK_STATUS_PROJECTION = {
+    'order_id': 1, 'status': 1, 'status_updated_at': 1, 'cash_paid': 1,
+    'payment_method': 1, 'created_at': 1, 'address.fullName': 1, 'address.phone': 1,
+}
+
+# Orders replayed per what-if request; the batch holds one row per order.
+WHAT_IF_MAX_ORDERS = getattr(settings, 'WHAT_IF_MAX_ORDERS', 200000)
 
 
 def serialize_doc(doc):
@@ -39,6 +76,8 @@ def serialize_doc(doc):
         return None
     if '_id' in doc:
         doc['_id'] = str(doc['_id'])
+    for field in SEARCH_FIELD_NAMES:
+        doc.pop(field, None)
     return doc
 
 
@@ -47,6 +86,61 @@ def serialize_docs(docs):
     return [serialize_doc(doc) for doc in docs]
 
 
+def fetch_in_order(collection, ids):
+    """Fetch documents by stringified _id in one query, keeping `ids` order."""
+    if not ids:
+        return []
+    lookup = list(ids)
+    lookup.extend(ObjectId(i) for i in ids if ObjectId.is_valid(i))
+    docs = {str(doc['_id']): doc for doc in collection.find({'_id': {'$in': lookup}})}
+    return [docs[i] for i in ids if i in docs]
+
+
+def cursor_page_size(request):
+    return page_limit(request.query_params.get('page_size'), default=20, maximum=100)
+
+
+def cursor_page_response(docs, next_cursor, prev_cursor, page_size):
+    """Response for ?pagination=cursor; the page-number shape stays the default."""
+    return Response({
+        'success': True,
+        'data': serialize_docs(docs),
+        'pagination': {
+            'mode': 'cursor',
+            'page_size': page_size,
+            'next': next_cursor,
+            'prev': prev_cursor,
+        }
+    })
+
+
+def keyset_list_response(request, collection, query, field='created_at', find=None, max_time_ms=None):
+    """A keyset page of `collection` sorted by (field, _id), newest first."""
+    page_size = cursor_page_size(request)
+    try:
+        docs, next_cursor, prev_cursor = keyset_window(
+            collection, query, field, page_size,
+            cursor=request.query_params.get('cursor') or None, find=find, max_time_ms=max_time_ms,
+        )
+    except ValueError as ve:
+        return Response({'success': False, 'error': str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+    return cursor_page_response(docs, next_cursor, prev_cursor, page_size)
+
+
+def search_budget(view):
+    """Answer 503 when a search query runs past ADMIN_SEARCH_MAX_TIME_MS."""
+    @functools.wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        try:
+            return view(self, request, *args, **kwargs)
+        except ExecutionTimeout:
+            return Response(
+                {'success': False, 'error': 'Search took too long, please narrow it down.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+    return wrapper
+
+
 # ─── Auth Views ──────────────────────────────────────────────────────
 
 class LoginView(APIView):
@@ -78,24 +172,34 @@ class LoginView(APIView):
             password_ok = False
 
             # Support both bcrypt-hashed and legacy plain-text stored passwords.
-            if isinstance(stored_password, bytes):
-                try:
-                    password_ok = bcrypt.checkpw(password.encode('utf-8'), stored_password)
-                except ValueError:
-                    password_ok = False
-            elif isinstance(stored_password, str):
-                if stored_password.startswith('$2'):
+            is_hashed = isinstance(stored_password, bytes) or (
+                isinstance(stored_password, str) and stored_password.startswith('$2')
+            )
+            try:
+                if is_hashed:
                     try:
-                        password_ok = bcrypt.checkpw(
-                            password.encode('utf-8'),
-                            stored_password.encode('utf-8')
-                        )
+                        password_ok = verify_password(password, stored_password)
                     except ValueError:
                         password_ok = False
-                else:
+                elif isinstance(stored_password, str):
                     password_ok = (password == stored_password)
+            except PasswordHashingBusy:
+                return Response(
+                    {'success': False, 'error': 'Server busy, please retry.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
 
             if password_ok:
+                # Migrate plain-text passwords and re-cost old hashes.
+                try:
+                    if not is_hashed or needs_rehash(stored_password):
+                        admins.update_one(
+                            {'_id': admin['_id'], 'password': stored_password},
+                            {'$set': {'password': hash_password(password)}}
+                        )
+                except (PasswordHashingBusy, PyMongoError):
+                    pass
+
                 token = generate_token(admin)
                 return Response({
                     'success': True,
@@ -145,6 +249,22 @@ class MeView(APIView):
         })
 
 
+class MetricsView(APIView):
+    """Per-worker runtime metrics for the admin panel."""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [AdminJWTAuthentication]
+
+    def get(self, request):
+        return Response({
+            'success': True,
+            'data': {
+                'password_hashing': hashing_stats(),
+                'mongo_pool': pool_stats(),
+                'outbox': outbox.stats(),
+            }
+        })
+
+
 # ─── Dashboard View ──────────────────────────────────────────────────
 
 class DashboardView(APIView):
@@ -158,10 +278,11 @@ class DashboardView(APIView):
         products = get_products_collection()
         referrals = get_referrals_collection()
 
-        total_users = users.count_documents({})
-        total_orders = orders.count_documents({})
-        total_products = products.count_documents({})
-        total_referrals = referrals.count_documents({})
+        total_users = totals.total(users, {}).count
+        archived = archive_stats()
+        total_orders = totals.total(orders, {}).count + archived['orders']
+        total_products = totals.total(products, {}).count
+        total_referrals = totals.total(referrals, {}).count
 
         # Calculate total revenue from delivered orders
         pipeline = [
@@ -169,10 +290,10 @@ class DashboardView(APIView):
             {'$group': {'_id': None, 'total': {'$sum': '$cash_paid'}}}
         ]
         revenue_result = list(orders.aggregate(pipeline))
-        total_revenue = revenue_result[0]['total'] if revenue_result else 0
+        total_revenue = (revenue_result[0]['total'] if revenue_result else 0) + archived['revenue']
 
         # Pending orders
-        pending_orders = orders.count_documents({'status': 'pending'})
+        pending_orders = totals.total(orders, {'status': 'pending'}).count
 
         # Recent orders
         recent_orders = list(
@@ -193,6 +314,8 @@ class DashboardView(APIView):
                 'total_referrals': total_referrals,
                 'total_revenue': total_revenue,
                 'pending_orders': pending_orders,
+                'archived_orders': archived['orders'],
+                'archived_revenue': archived['revenue'],
                 'recent_orders': serialize_docs(recent_orders),
                 'recent_referrals': serialize_docs(recent_referrals),
             }
@@ -206,27 +329,25 @@ class UserListCreateView(APIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [AdminJWTAuthentication]
 
+    @search_budget
     def get(self, request):
         collection = get_users_collection()
 
         # Search & filter
-        query = {}
-        search = request.query_params.get('search', '')
-        if search:
-            query['$or'] = [
-                {'name': {'$regex': search, '$options': 'i'}},
-                {'email': {'$regex': search, '$options': 'i'}},
-                {'phone': {'$regex': search, '$options': 'i'}},
-            ]
+        query = compile_search(request.query_params.get('search', ''), USER_SEARCH) or {}
+        max_time_ms = search_max_time_ms() if query else None
+
+        if cursor_mode(request):
+            return keyset_list_response(request, collection, query, max_time_ms=max_time_ms)
 
         # Pagination
         page = int(request.query_params.get('page', 1))
         page_size = int(request.query_params.get('page_size', 20))
         skip = (page - 1) * page_size
 
-        total = collection.count_documents(query)
+        total = totals.total(collection, query, exact_total(request), max_time_ms)
         users = list(
-            collection.find(query)
+            collection.find(query, max_time_ms=max_time_ms)
             .sort('created_at', -1)
             .skip(skip)
             .limit(page_size)
@@ -235,12 +356,7 @@ class UserListCreateView(APIView):
         return Response({
             'success': True,
             'data': serialize_docs(users),
-            'pagination': {
-                'total': total,
-                'page': page,
-                'page_size': page_size,
-                'total_pages': (total + page_size - 1) // page_size,
-            }
+            'pagination': total.pagination(page, page_size),
         })
 
     def post(self, request):
@@ -263,22 +379,30 @@ class UserListCreateView(APIView):
 
         # Hash password if provided
         password = data.get('password', 'default123')
-        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        try:
+            hashed = hash_password(password)
+        except PasswordHashingBusy:
+            return Response(
+                {'success': False, 'error': 'Server busy, please retry.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
 
         now = datetime.now(timezone.utc)
         user_doc = {
             'phone': data['phone'],
             'email': data['email'],
             'name': data['name'],
-            'password': hashed.decode('utf-8'),
+            'password': hashed,
             'points': data.get('points', 0),
             'referral_code': data.get('referral_code'),
             'created_at': now,
             'updated_at': now,
         }
+        user_doc.update(search_fields('users', user_doc))
 
         result = collection.insert_one(user_doc)
         user_doc['_id'] = str(result.inserted_id)
+        leaderboard.record(user_doc['_id'], user_doc['points'], user_doc['name'])
 
         return Response(
             {'success': True, 'data': serialize_doc(user_doc)},
@@ -324,14 +448,18 @@ class UserDetailView(APIView):
 
         update_data = {k: v for k, v in serializer.validated_data.items() if v is not None}
         update_data['updated_at'] = datetime.now(timezone.utc)
+        update_data.update(search_fields_for_update('users', update_data))
 
         collection = get_users_collection()
         collection.update_one(
             {'_id': ObjectId(pk)},
             {'$set': update_data}
         )
+        invalidate_user_tokens(pk)
 
         updated_user = self.get_object(pk)
+        if updated_user:
+            leaderboard.record(pk, updated_user.get('points', 0), updated_user.get('name'))
         return Response({'success': True, 'data': serialize_doc(updated_user)})
 
     def delete(self, request, pk):
@@ -344,6 +472,8 @@ class UserDetailView(APIView):
 
         collection = get_users_collection()
         collection.delete_one({'_id': ObjectId(pk)})
+        invalidate_user_tokens(pk)
+        leaderboard.remove(pk)
         return Response({'success': True, 'message': 'User deleted.'})
 
 
@@ -355,8 +485,12 @@ class UserAddressView(APIView):
     authentication_classes = [AdminJWTAuthentication]
 
     def get(self, request, pk):
-        orders = get_orders_collection()
-        user_orders = list(orders.find({'user_id': pk}, {'address': 1, 'order_id': 1}))
+        projection = {'address': 1, 'order_id': 1, 'created_at': 1}
+        if include_archived(request):
+            user_orders = merged_find({'user_id': pk}, projection)
+        else:
+            orders = get_orders_collection()
+            user_orders = list(orders.find({'user_id': pk}, projection))
         addresses = []
         for order in user_orders:
             if 'address' in order:
@@ -374,6 +508,7 @@ class ReferralListCreateView(APIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [AdminJWTAuthentication]
 
+    @search_budget
     def get(self, request):
         collection = get_referrals_collection()
 
@@ -382,21 +517,22 @@ class ReferralListCreateView(APIView):
         if status_filter:
             query['status'] = status_filter
 
-        search = request.query_params.get('search', '')
-        if search:
-            query['$or'] = [
-                {'referred_user.name': {'$regex': search, '$options': 'i'}},
-                {'referred_user.email': {'$regex': search, '$options': 'i'}},
-                {'referrer_id': {'$regex': search, '$options': 'i'}},
-            ]
+        max_time_ms = None
+        searched = compile_search(request.query_params.get('search', ''), REFERRAL_SEARCH)
+        if searched:
+            query.update(searched)
+            max_time_ms = search_max_time_ms()
+
+        if cursor_mode(request):
+            return keyset_list_response(request, collection, query, max_time_ms=max_time_ms)
 
         page = int(request.query_params.get('page', 1))
         page_size = int(request.query_params.get('page_size', 20))
         skip = (page - 1) * page_size
 
-        total = collection.count_documents(query)
+        total = totals.total(collection, query, exact_total(request), max_time_ms)
         referrals = list(
-            collection.find(query)
+            collection.find(query, max_time_ms=max_time_ms)
             .sort('created_at', -1)
             .skip(skip)
             .limit(page_size)
@@ -405,12 +541,7 @@ class ReferralListCreateView(APIView):
         return Response({
             'success': True,
             'data': serialize_docs(referrals),
-            'pagination': {
-                'total': total,
-                'page': page,
-                'page_size': page_size,
-                'total_pages': (total + page_size - 1) // page_size,
-            }
+            'pagination': total.pagination(page, page_size),
         })
 
     def post(self, request):
@@ -424,6 +555,7 @@ class ReferralListCreateView(APIView):
         collection = get_referrals_collection()
         data = serializer.validated_data
         data['created_at'] = datetime.now(timezone.utc)
+        data.update(search_fields('referrals', data))
 
         result = collection.insert_one(data)
         data['_id'] = str(result.inserted_id)
@@ -471,6 +603,7 @@ class ReferralDetailView(APIView):
             )
 
         update_data = {k: v for k, v in serializer.validated_data.items() if v is not None}
+        update_data.update(search_fields_for_update('referrals', update_data))
 
         collection = get_referrals_collection()
         collection.update_one(
@@ -501,6 +634,7 @@ class OrderListCreateView(APIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [AdminJWTAuthentication]
 
+    @search_budget
     def get(self, request):
         collection = get_orders_collection()
 
@@ -513,35 +647,43 @@ class OrderListCreateView(APIView):
         if payment_filter:
             query['payment_method'] = payment_filter
 
-        search = request.query_params.get('search', '')
-        if search:
-            query['$or'] = [
-                {'order_id': {'$regex': search, '$options': 'i'}},
-                {'address.fullName': {'$regex': search, '$options': 'i'}},
-                {'address.phone': {'$regex': search, '$options': 'i'}},
-            ]
+        max_time_ms = None
+        searched = compile_search(request.query_params.get('search', ''), ORDER_SEARCH)
+        if searched:
+            query.update(searched)
+            max_time_ms = search_max_time_ms()
+
+        if cursor_mode(request):
+            return keyset_list_response(
+                request, collection, query,
+                find=merged_finder(max_time_ms) if include_archived(request) else None,
+                max_time_ms=max_time_ms,
+            )
 
         page = int(request.query_params.get('page', 1))
         page_size = int(request.query_params.get('page_size', 20))
         skip = (page - 1) * page_size
 
-        total = collection.count_documents(query)
-        orders = list(
-            collection.find(query)
-            .sort('created_at', -1)
-            .skip(skip)
-            .limit(page_size)
-        )
+        exact = exact_total(request)
+        if include_archived(request):
+            total = (
+                totals.total(collection, query, exact, max_time_ms)
+                + totals.total(get_orders_archive_collection(), query, exact, max_time_ms)
+            )
+            orders = merged_find(query, skip=skip, limit=page_size, max_time_ms=max_time_ms)
+        else:
+            total = totals.total(collection, query, exact, max_time_ms)
+            orders = list(
+                collection.find(query, max_time_ms=max_time_ms)
+                .sort('created_at', -1)
+                .skip(skip)
+                .limit(page_size)
+            )
 
         return Response({
             'success': True,
             'data': serialize_docs(orders),
-            'pagination': {
-                'total': total,
-                'page': page,
-                'page_size': page_size,
-                'total_pages': (total + page_size - 1) // page_size,
-            }
+            'pagination': total.pagination(page, page_size),
         })
 
     def post(self, request):
@@ -555,6 +697,9 @@ class OrderListCreateView(APIView):
         collection = get_orders_collection()
         data = serializer.validated_data
         data['created_at'] = datetime.now(timezone.utc)
+        if not data.get('order_id'):
+            data['order_id'] = new_order_id()
+        data.update(search_fields('orders', data))
 
         result = collection.insert_one(data)
         data['_id'] = str(result.inserted_id)
@@ -579,6 +724,11 @@ class OrderDetailView(APIView):
 
     def get(self, request, pk):
         order = self.get_object(pk)
+        if not order and include_archived(request):
+            try:
+                order = get_orders_archive_collection().find_one({'_id': ObjectId(pk)})
+            except InvalidId:
+                order = None
         if not order:
             return Response(
                 {'success': False, 'error': 'Order not found.'},
@@ -602,6 +752,7 @@ class OrderDetailView(APIView):
             )
 
         update_data = {k: v for k, v in serializer.validated_data.items() if v is not None}
+        update_data.update(search_fields_for_update('orders', update_data))
 
         collection = get_orders_collection()
         collection.update_one(
@@ -641,9 +792,10 @@ class OrderStatusView(APIView):
 
         collection = get_orders_collection()
         try:
-            result = collection.update_one(
+            order = collection.find_one_and_update(
                 {'_id': ObjectId(pk)},
-                {'$set': {'status': new_status}}
+                {'$set': {'status': new_status, 'status_updated_at': datetime.now(timezone.utc)}},
+                return_document=ReturnDocument.AFTER,
             )
         except InvalidId:
             return Response(
@@ -651,16 +803,226 @@ class OrderStatusView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if result.matched_count == 0:
+        if not order:
             return Response(
                 {'success': False, 'error': 'Order not found.'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        order = collection.find_one({'_id': ObjectId(pk)})
         return Response({'success': True, 'data': serialize_doc(order)})
 
 
+class OrderBulkStatusView(APIView):
+    """Move many orders to one status in a handful of round trips.
+
+    Body: {"status": target, "ids": [...]} with _ids or order_ids, or
+    {"status": target, "filter": {"status": ..., "payment_method": ...}}.
+    Each order must be allowed to move to the target by ORDER_TRANSITIONS.
+    All allowed moves go out in one bulk_write, with one UpdateMany per
+    source status. The status guard in each update makes a concurrent change
+    show up as a conflict rather than being overwritten. With
+    "return_orders": true the updated orders come back in a compact form.
+
+    More than BULK_STATUS_MAX_ORDERS ids is a 400. A filter matching more
+    orders than that moves the first batch and answers "truncated": true;
+    orders already at the target are left out of the match, so repeating
+    the same request continues with the rest.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [AdminJWTAuthentication]
+
+    def _select(self, collection, data, target):
+        """([(key, doc or None)], truncated) for the orders the request names."""
+        ids = data.get('ids')
+        if ids:
+            if not isinstance(ids, list):
+                raise ValueError('ids must be a list.')
+            ids = list(dict.fromkeys(str(value) for value in ids))
+            if len(ids) > BULK_STATUS_MAX_ORDERS:
+                raise ValueError(f'At most {BULK_STATUS_MAX_ORDERS} ids per request.')
+            object_ids = [ObjectId(value) for value in ids if ObjectId.is_valid(value)]
+            order_ids = [normalize_order_id(value) for value in ids]
+            docs = list(collection.find(
+                {'$or': [{'_id': {'$in': object_ids}}, {'order_id': {'$in': order_ids}}]},
+                {'status': 1, 'order_id': 1},
+            ))
+            by_key = {}
+            for doc in docs:
+                by_key[str(doc['_id'])] = doc
+                if doc.get('order_id'):
+                    by_key[doc['order_id']] = doc
+            return [(value, by_key.get(value) or by_key.get(normalize_order_id(value))) for value in ids], False
+
+        filters = data.get('filter')
+        if not isinstance(filters, dict) or not filters:
+            raise ValueError('Provide ids or a filter.')
+        query = {
+            field: filters[field]
+            for field in ('status', 'payment_method', 'user_id')
+            if isinstance(filters.get(field), str) and filters[field]
+        }
+        if not query:
+            raise ValueError('filter supports status, payment_method and user_id.')
+        if 'status' not in query:
+            query['status'] = {'$ne': target}
+        docs = list(
+            collection.find(query, {'status': 1, 'order_id': 1})
+            .sort('_id', 1)
+            .limit(BULK_STATUS_MAX_ORDERS + 1)
+        )
+        truncated = len(docs) > BULK_STATUS_MAX_ORDERS
+        return [(str(doc['_id']), doc) for doc in docs[:BULK_STATUS_MAX_ORDERS]], truncated
+
+    def post(self, request):
+        target = request.data.get('status')
+        if target not in ORDER_TRANSITIONS:
+            return Response(
+                {'success': False, 'error': f'Invalid status. Must be one of: {list(ORDER_TRANSITIONS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        collection = get_orders_collection()
+        try:
+            selected, truncated = self._select(collection, request.data, target)
+        except ValueError as ve:
+            return Response({'success': False, 'error': str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+
+        outcomes = {}
+        by_source = {}
+        seen = set()
+        for key, doc in selected:
+            if doc is not None and doc['_id'] in seen:
+                outcomes[key] = {'result': 'duplicate', 'order_id': doc.get('order_id')}
+                continue
+            if doc is None:
+                outcomes[key] = {'result': 'not_found'}
+            elif doc.get('status') == target:
+                outcomes[key] = {'result': 'unchanged', 'order_id': doc.get('order_id')}
+            elif target not in ORDER_TRANSITIONS.get(doc.get('status'), ()):
+                outcomes[key] = {
+                    'result': 'invalid_transition',
+                    'order_id': doc.get('order_id'),
+                    'from': doc.get('status'),
+                }
+            else:
+                by_source.setdefault(doc['status'], {})[doc['_id']] = (key, doc.get('order_id'))
+            if doc is not None:
+                seen.add(doc['_id'])
+
+        now = datetime.now(timezone.utc)
+        moving = [oid for group in by_source.values() for oid in group]
+        updated = []
+        if by_source:
+            result = collection.bulk_write([
+                UpdateMany(
+                    {'_id': {'$in': list(group)}, 'status': source},
+                    {'$set': {'status': target, 'status_updated_at': now}},
+                )
+                for source, group in by_source.items()
+            ], ordered=False)
+            conflicted = set()
+            if result.modified_count < len(moving):
+                # Someone else changed a few of them in between; find out which.
+                conflicted = {
+                    doc['_id']
+                    for doc in collection.find(
+                        {'_id': {'$in': moving}, 'status_updated_at': {'$ne': now}}, {'_id': 1}
+                    )
+                }
+            for source, group in by_source.items():
+                for oid, (key, order_id) in group.items():
+                    if oid in conflicted:
+                        outcomes[key] = {'result': 'conflict', 'order_id': order_id, 'from': source}
+                    else:
+                        outcomes[key] = {'result': 'updated', 'order_id': order_id, 'from': source}
+                        updated.append(oid)
+
+        counts = {}
+        for outcome in outcomes.values():
+            counts[outcome['result']] = counts.get(outcome['result'], 0) + 1
+
+        body = {'success': True, 'status': target, 'counts': counts, 'results': outcomes}
+        if truncated:
+            body['truncated'] = True
+            body['message'] = (
+                f'More than {BULK_STATUS_MAX_ORDERS} orders match; only the first '
+                f'{BULK_STATUS_MAX_ORDERS} were processed. Repeat the request for the rest.'
+            )
+        if request.data.get('return_orders'):
+            body['orders'] = serialize_docs(collection.find(
+                {'_id': {'$in': updated}}, BULK_STATUS_PROJECTION
+            )) if updated else []
+        return Response(body)
+
+
+class OrderWhatIfView(APIView):
+    """Replay order history under proposed pricing parameters."""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [AdminJWTAuthentication]
+
+    def post(self, request):
+        try:
+            overrides = {
+                field: float(request.data[field])
+                for field in PricingParams._fields
+                if request.data.get(field) not in (None, '')
+            }
+            days = int(request.data.get('days', 90))
+            limit = min(int(request.data.get('limit', 50000)), WHAT_IF_MAX_ORDERS)
+            sample = int(request.data.get('cross_check', 200))
+        except (TypeError, ValueError):
+            return Response(
+                {'success': False, 'error': 'Parameters must be numbers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if overrides.get('coin_value', 1) <= 0:
+            return Response(
+                {'success': False, 'error': 'coin_value must be positive.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        scenario = DEFAULT_PRICING._replace(**overrides)
+
+        query = {'created_at': {'$gte': datetime.now(timezone.utc) - timedelta(days=days)}}
+        statuses = request.data.get('statuses')
+        if isinstance(statuses, str):
+            statuses = [value.strip() for value in statuses.split(',') if value.strip()]
+        if statuses:
+            query['status'] = {'$in': list(statuses)}
+
+        # Older orders live in orders_archive; replay across both. created_at
+        # stays in the projection because the merge orders by it.
+        orders = merged_find(
+            query,
+            {'order_items.price': 1, 'order_items.quantity': 1, 'coins_used': 1, 'created_at': 1},
+            limit=limit,
+        )
+        batch = CartBatch.from_orders(orders)
+
+        current = quote_batch(batch)
+        proposed = quote_batch(batch, scenario)
+        current_summary = summarize(batch, current)
+        proposed_summary = summarize(batch, proposed)
+        mismatches = cross_check(batch, proposed, scenario, sample=sample) if sample > 0 else []
+
+        return Response({
+            'success': True,
+            'data': {
+                'params': {'current': DEFAULT_PRICING._asdict(), 'proposed': scenario._asdict()},
+                'current': current_summary,
+                'proposed': proposed_summary,
+                'delta': {
+                    key: round(proposed_summary[key] - value, 4)
+                    for key, value in current_summary.items()
+                },
+                'cross_check': {
+                    'sampled': min(sample, len(batch)) if sample > 0 else 0,
+                    'mismatches': mismatches[:20],
+                    'mismatch_count': len(mismatches),
+                },
+            }
+        })
+
+
 # ─── Product Views ───────────────────────────────────────────────────
 
 class ProductListCreateView(APIView):
@@ -671,40 +1033,43 @@ class ProductListCreateView(APIView):
     def get(self, request):
         collection = get_products_collection()
 
-        query = {}
-        category = request.query_params.get('category', '')
-        if category:
-            query['category'] = {'$regex': category, '$options': 'i'}
-
-        brand = request.query_params.get('brand', '')
-        if brand:
-            query['brand'] = {'$regex': brand, '$options': 'i'}
-
         in_stock = request.query_params.get('inStock', '')
         if in_stock.lower() == 'true':
-            query['inStock'] = True
+            in_stock = True
         elif in_stock.lower() == 'false':
-            query['inStock'] = False
-
-        search = request.query_params.get('search', '')
-        if search:
-            query['$or'] = [
-                {'name': {'$regex': search, '$options': 'i'}},
-                {'brand': {'$regex': search, '$options': 'i'}},
-                {'category': {'$regex': search, '$options': 'i'}},
-            ]
+            in_stock = False
+        else:
+            in_stock = None
+
+        # Filters resolve against the in-process index; Mongo only serves the page.
+        sort_keys = product_search.search(
+            search=request.query_params.get('search', ''),
+            category=request.query_params.get('category', ''),
+            brand=request.query_params.get('brand', ''),
+            in_stock=in_stock,
+            keys=True,
+        )
+        product_ids = [key[-1] for key in sort_keys]
+
+        if cursor_mode(request):
+            # Same (name, _id) order as the index, so the cursor is a bisect.
+            page_size = cursor_page_size(request)
+            try:
+                start, end, next_cursor, prev_cursor = slice_window(
+                    sort_keys, page_size, request.query_params.get('cursor') or None,
+                )
+            except ValueError as ve:
+                return Response({'success': False, 'error': str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+            products = fetch_in_order(collection, product_ids[start:end])
+            return cursor_page_response(products, next_cursor, prev_cursor, page_size)
 
         page = int(request.query_params.get('page', 1))
         page_size = int(request.query_params.get('page_size', 20))
         skip = (page - 1) * page_size
 
-        total = collection.count_documents(query)
-        products = list(
-            collection.find(query)
-            .sort('name', 1)
-            .skip(skip)
-            .limit(page_size)
-        )
+        total = len(product_ids)
+        page_ids = product_ids[skip:skip + page_size]
+        products = fetch_in_order(collection, page_ids)
 
         return Response({
             'success': True,
@@ -730,6 +1095,7 @@ class ProductListCreateView(APIView):
         data['created_at'] = datetime.now(timezone.utc)
 
         result = collection.insert_one(data)
+        catalog.bump(result.inserted_id)
         data['_id'] = str(result.inserted_id)
 
         return Response(
@@ -783,6 +1149,7 @@ class ProductDetailView(APIView):
             {'_id': product['_id']},
             {'$set': update_data}
         )
+        catalog.bump(product['_id'])
 
         updated = collection.find_one({'_id': product['_id']})
         return Response({'success': True, 'data': serialize_doc(updated)})
@@ -797,4 +1164,5 @@ class ProductDetailView(APIView):
 
         collection = get_products_collection()
         collection.delete_one({'_id': product['_id']})
+        catalog.bump(product['_id'], op="delete")
         return Response({'success': True, 'message': 'Product deleted.'})
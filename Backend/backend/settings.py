@@ -169,6 +169,25 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Verified access tokens are cached per worker; entries never outlive the
+# token's exp and are capped so other workers' writes are seen quickly.
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_MAX_TTL_SECONDS = int(os.environ.get("TOKEN_CACHE_MAX_TTL_SECONDS", "300"))
+
+# bcrypt runs in a small process pool; requests beyond the queue limit get 503.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "32"))
+PASSWORD_HASH_TIMEOUT_SECONDS = int(os.environ.get("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
+
+# bcrypt cost: fixed when PASSWORD_HASH_ROUNDS > 0, otherwise calibrated to the
+# largest cost that hashes within the budget and shared through counters by
+# every worker on the same kind of host; changing the budget or MIN/MAX, or
+# new hardware, recalibrates.
+PASSWORD_HASH_ROUNDS = int(os.environ.get("PASSWORD_HASH_ROUNDS", "0"))
+PASSWORD_HASH_BUDGET_MS = int(os.environ.get("PASSWORD_HASH_BUDGET_MS", "250"))
+PASSWORD_HASH_MIN_ROUNDS = int(os.environ.get("PASSWORD_HASH_MIN_ROUNDS", "10"))
+PASSWORD_HASH_MAX_ROUNDS = int(os.environ.get("PASSWORD_HASH_MAX_ROUNDS", "15"))
+
 # ---------------------------------------------------------------------------
 # Referral Points
 # ---------------------------------------------------------------------------
@@ -176,6 +195,59 @@ SIMPLE_JWT = {
 REFERRAL_POINTS_FOR_REFERRER = 100
 REFERRAL_POINTS_FOR_REFEREE = 50
 
+# In-process leaderboard: tracks the top LEADERBOARD_CAPACITY users and
+# re-seeds from Mongo every LEADERBOARD_RECONCILE_SECONDS.
+LEADERBOARD_SIZE = 50
+LEADERBOARD_CAPACITY = int(os.environ.get("LEADERBOARD_CAPACITY", "200"))
+LEADERBOARD_RECONCILE_SECONDS = int(os.environ.get("LEADERBOARD_RECONCILE_SECONDS", "300"))
+# The full points index behind "my rank" is re-read in the background this often.
+LEADERBOARD_RANK_RECONCILE_SECONDS = int(os.environ.get("LEADERBOARD_RANK_RECONCILE_SECONDS", "1800"))
+
+# Run the points update and order insert in one multi-document transaction.
+# Needs a replica set (Atlas is one); otherwise a failed insert is compensated.
+ORDER_USE_TRANSACTIONS = os.environ.get("ORDER_USE_TRANSACTIONS", "False").lower() in ("true", "1", "yes")
+
+# Post-order side effects (confirmation mail, order_stats) run from the Mongo
+# outbox on a thread pool. With ORDER_DEFER_POINTS_CREDIT earned points are
+# credited there too, and the create_order response shows the balance before
+# them.
+OUTBOX_WORKERS = int(os.environ.get("OUTBOX_WORKERS", "2"))
+OUTBOX_POLL_SECONDS = int(os.environ.get("OUTBOX_POLL_SECONDS", "10"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+# Start the outbox poller when the app boots; turn off when a separate
+# `manage.py run_outbox` process does the polling.
+OUTBOX_AUTOSTART = os.environ.get("OUTBOX_AUTOSTART", "True").lower() in ("true", "1", "yes")
+ORDER_DEFER_POINTS_CREDIT = os.environ.get("ORDER_DEFER_POINTS_CREDIT", "False").lower() in ("true", "1", "yes")
+
+# `manage.py archive_orders` moves delivered/cancelled orders older than this
+# into orders_archive.
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get("ORDER_ARCHIVE_AFTER_DAYS", "180"))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.environ.get("ORDER_ARCHIVE_BATCH_SIZE", "500"))
+
+# Admin list totals: filtered counts are cached this long; exact_total=false
+# stops counting at ADMIN_TOTALS_CAP and reports "more than" instead.
+ADMIN_TOTALS_TTL_SECONDS = int(os.environ.get("ADMIN_TOTALS_TTL_SECONDS", "30"))
+ADMIN_TOTALS_CAP = int(os.environ.get("ADMIN_TOTALS_CAP", "1000"))
+
+# Admin list searches (and their counts) give up after this long and answer 503.
+ADMIN_SEARCH_MAX_TIME_MS = int(os.environ.get("ADMIN_SEARCH_MAX_TIME_MS", "2000"))
+
+# A worker's claim on an Idempotency-Key expires after this long, so a retry
+# can take over the key when the worker died mid-request. Never shorter than
+# twice MONGO_SOCKET_TIMEOUT_MS.
+IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get("IDEMPOTENCY_LEASE_SECONDS", "60"))
+
+# Quotes returned by order_quote can be redeemed by create_order for this long.
+QUOTE_TOKEN_TTL_SECONDS = int(os.environ.get("QUOTE_TOKEN_TTL_SECONDS", "600"))
+# Signing key for quote tokens; derived from SECRET_KEY when empty.
+QUOTE_TOKEN_SECRET = os.environ.get("QUOTE_TOKEN_SECRET", "")
+
+# Order ids draw sequence numbers from the counters collection in blocks.
+ORDER_ID_BLOCK_SIZE = int(os.environ.get("ORDER_ID_BLOCK_SIZE", "100"))
+
+# Public catalog cache: workers re-check the catalog version stamp this often.
+CATALOG_POLL_SECONDS = int(os.environ.get("CATALOG_POLL_SECONDS", "5"))
+
 # ---------------------------------------------------------------------------
 # Internationalization / Static
 # ---------------------------------------------------------------------------
@@ -203,6 +275,15 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME")
 
+# One pooled client per worker process (see mongo/client.py).
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_CONNECTING = int(os.getenv("MONGO_MAX_CONNECTING", "2"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 
@@ -0,0 +1,131 @@
+"""The one MongoClient per process.
+
+Every collection accessor resolves through get_db() so all code shares one
+connection pool, sized by the MONGO_* pool settings. The client is created on
+first use with connect=False, which keeps it fork-safe under gunicorn.
+pool_stats() reports checkout counts and wait times from the pool listener.
+"""
+
+import threading
+
+from django.conf import settings
+from pymongo import MongoClient, monitoring
+
+try:
+    import certifi
+except ImportError:
+    certifi = None
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts pool checkouts and how long callers waited for a connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections_open = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def _bump(self, **deltas):
+        with self._lock:
+            for field, delta in deltas.items():
+                setattr(self, field, getattr(self, field) + delta)
+
+    def connection_checked_out(self, event):
+        # `duration` is available on pymongo >= 4.7.
+        wait_ms = (getattr(event, "duration", None) or 0.0) * 1000
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def connection_check_out_failed(self, event):
+        self._bump(checkout_failures=1)
+
+    def connection_checked_in(self, event):
+        self._bump(checked_out=-1)
+
+    def connection_created(self, event):
+        self._bump(connections_open=1)
+
+    def connection_closed(self, event):
+        self._bump(connections_open=-1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "connections_open": self.connections_open,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_ms_avg": round(self.wait_ms_total / (self.checkouts or 1), 2),
+                "wait_ms_max": round(self.wait_ms_max, 2),
+            }
+
+
+_pool_stats = PoolStatsListener()
+_client = None
+_client_lock = threading.Lock()
+
+
+def _client_options():
+    uri = settings.MONGO_URI or ""
+    options = {
+        "maxPoolSize": getattr(settings, "MONGO_MAX_POOL_SIZE", 20),
+        "minPoolSize": getattr(settings, "MONGO_MIN_POOL_SIZE", 0),
+        "connectTimeoutMS": getattr(settings, "MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": getattr(settings, "MONGO_SOCKET_TIMEOUT_MS", 20000),
+        "serverSelectionTimeoutMS": getattr(settings, "MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "waitQueueTimeoutMS": getattr(settings, "MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000),
+        "maxConnecting": getattr(settings, "MONGO_MAX_CONNECTING", 2),
+        "connect": False,
+        "event_listeners": [_pool_stats],
+    }
+    if certifi and (uri.startswith("mongodb+srv://") or "tls=true" in uri.lower()):
+        options["tlsCAFile"] = certifi.where()
+    return options
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(settings.MONGO_URI, **_client_options())
+    return _client
+
+
+def get_db():
+    return get_client()[settings.MONGO_DB_NAME]
+
+
+def get_collection(name):
+    return get_db()[name]
+
+
+def pool_stats():
+    stats = _pool_stats.snapshot()
+    stats["max_pool_size"] = getattr(settings, "MONGO_MAX_POOL_SIZE", 20)
+    return stats
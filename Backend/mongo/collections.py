@@ -1,11 +1,10 @@
-from pymongo import MongoClient
-from django.conf import settings
+from mongo.client import get_collection
 
-client = MongoClient(settings.MONGO_URI)
-db = client[settings.MONGO_DB_NAME]
-
-users_col = db["users"]
-referrals_col = db["referrals"]
-otps_col = db["otps"]  
-orders_col = db["orders"]
-user_addresses_col = db['user_address']
\ No newline at end of file
+users_col = get_collection("users")
+referrals_col = get_collection("referrals")
+otps_col = get_collection("otps")  
+orders_col = get_collection("orders")
+user_addresses_col = get_collection('user_address')
+idempotency_col = get_collection("idempotency_keys")
+counters_col = get_collection("counters")
+outbox_col = get_collection("outbox")
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""Every index the hot queries rely on, declared in one place.
+
+`python manage.py ensure_indexes` builds them and then explains each entry in
+HOT_QUERIES, failing if any of them still plans a collection scan. Add the
+index and the query shape here together whenever a new hot path appears.
+"""
+
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+
+def _index(keys, name, **options):
+    return IndexModel(keys, name=name, background=True, **options)
+
+
+INDEXES = {
+    "users": [
+        _index([("phone", ASCENDING)], "phone_unique", unique=True),
+        _index(
+            [("referral_code", ASCENDING)], "referral_code_unique", unique=True,
+            # Users get their code right after insert, so null codes must not collide.
+            partialFilterExpression={"referral_code": {"$type": "string"}},
+        ),
+        _index([("points", DESCENDING)], "points_desc"),
+        _index([("created_at", DESCENDING), ("_id", DESCENDING)], "created_at_id_desc"),
+        # Admin search: anchored prefixes of the lower-cased copies (accounts.admin_search).
+        _index([("name_lc", ASCENDING)], "name_lc"),
+        _index([("email_lc", ASCENDING)], "email_lc"),
+    ],
+    "referrals": [
+        _index([("referrer_id", ASCENDING)], "referrer_id"),
+        _index([("created_at", DESCENDING), ("_id", DESCENDING)], "created_at_id_desc"),
+        _index([("referred_user.phone", ASCENDING)], "referred_phone"),
+        _index([("referred_name_lc", ASCENDING)], "referred_name_lc"),
+        _index([("referred_email_lc", ASCENDING)], "referred_email_lc"),
+    ],
+    "otps": [
+        _index([("phone", ASCENDING), ("email", ASCENDING), ("otp", ASCENDING)], "phone_email_otp"),
+        _index([("expires_at", ASCENDING)], "expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "orders": [
+        _index(
+            [("order_id", ASCENDING)], "order_id_unique", unique=True,
+            # Older orders have no order_id; they must not collide as nulls.
+            partialFilterExpression={"order_id": {"$type": "string"}},
+        ),
+        # Serves orders/mine/ keyset pages: equality on user_id, then the (created_at, _id) sort.
+        _index(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            "user_id_created_at_id",
+        ),
+        _index([("status", ASCENDING), ("created_at", DESCENDING)], "status_created_at"),
+        _index([("created_at", DESCENDING), ("_id", DESCENDING)], "created_at_id_desc"),
+        _index([("address.phone", ASCENDING)], "address_phone"),
+        _index([("full_name_lc", ASCENDING)], "full_name_lc"),
+    ],
+    "orders_archive": [
+        _index(
+            [("order_id", ASCENDING)], "order_id_unique", unique=True,
+            partialFilterExpression={"order_id": {"$type": "string"}},
+        ),
+        _index(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            "user_id_created_at_id",
+        ),
+        _index([("status", ASCENDING), ("created_at", DESCENDING)], "status_created_at"),
+        _index([("created_at", DESCENDING), ("_id", DESCENDING)], "created_at_id_desc"),
+        _index([("address.phone", ASCENDING)], "address_phone"),
+        _index([("full_name_lc", ASCENDING)], "full_name_lc"),
+    ],
+    "user_address": [
+        _index([("user_id", ASCENDING)], "user_id"),
+    ],
+    "catalog_changes": [
+        _index([("version", ASCENDING)], "version_unique", unique=True),
+        # Older changes fall off after 30 days; clients that far behind resync fully.
+        _index([("created_at", ASCENDING)], "created_at_ttl", expireAfterSeconds=30 * 24 * 3600),
+    ],
+    "idempotency_keys": [
+        # create_order replays are honoured for a day.
+        _index([("created_at", ASCENDING)], "created_at_ttl", expireAfterSeconds=24 * 3600),
+    ],
+    "outbox": [
+        _index([("state", ASCENDING), ("next_attempt_at", ASCENDING)], "state_next_attempt_at"),
+        _index([("state", ASCENDING), ("locked_until", ASCENDING)], "state_locked_until"),
+        # Only finished jobs carry completed_at; failed ones stay until handled.
+        _index([("completed_at", ASCENDING)], "completed_at_ttl", expireAfterSeconds=7 * 24 * 3600),
+    ],
+    "products": [
+        _index([("name", ASCENDING)], "name"),
+        _index([("id", ASCENDING)], "id", sparse=True),
+    ],
+}
+
+
+# (description, collection, filter, sort, limit) for the queries on hot paths.
+HOT_QUERIES = [
+    ("LoginLogic / signup_logic by phone", "users", {"phone": "0000000000"}, None, 1),
+    ("signup_logic referral lookup", "users", {"referral_code": "SS00000000"}, None, 1),
+    ("LeaderboardView top users", "users", {}, [("points", DESCENDING)], 50),
+    ("admin user listing", "users", {}, [("created_at", DESCENDING)], 20),
+    (
+        "admin user cursor page", "users", {"created_at": {"$lt": datetime(2025, 1, 1)}},
+        [("created_at", DESCENDING), ("_id", DESCENDING)], 21,
+    ),
+    ("admin user search by name", "users", {"name_lc": {"$regex": "^ra"}}, None, 20),
+    ("admin user search by email", "users", {"email_lc": {"$regex": "^ra@"}}, None, 20),
+    ("get_my_referrals / ProfileView", "referrals", {"referrer_id": "000000000000000000000000"}, None, 0),
+    ("admin referral listing", "referrals", {}, [("created_at", DESCENDING)], 20),
+    (
+        "VOtp / RPassword lookup", "otps",
+        {"phone": "0000000000", "email": "x@example.com", "otp": "000000", "is_used": False},
+        None, 1,
+    ),
+    ("UserAddressView", "orders", {"user_id": "000000000000000000000000"}, [("created_at", DESCENDING)], 0),
+    (
+        "MyOrdersView keyset page", "orders",
+        {"user_id": "000000000000000000000000", "created_at": {"$lt": datetime(2025, 1, 1)}},
+        [("created_at", DESCENDING), ("_id", DESCENDING)], 11,
+    ),
+    ("DashboardView pending orders", "orders", {"status": "pending"}, None, 0),
+    ("DashboardView recent orders", "orders", {}, [("created_at", DESCENDING)], 5),
+    (
+        "admin order cursor page", "orders", {"created_at": {"$lt": datetime(2025, 1, 1)}},
+        [("created_at", DESCENDING), ("_id", DESCENDING)], 21,
+    ),
+    ("admin referral search by phone", "referrals", {"referred_user.phone": "0000000000"}, None, 20),
+    ("admin referral search by name", "referrals", {"referred_name_lc": {"$regex": "^ra"}}, None, 20),
+    ("admin order search by phone prefix", "orders", {"address.phone": {"$regex": "^98765"}}, None, 20),
+    ("admin order search by name", "orders", {"full_name_lc": {"$regex": "^ra"}}, None, 20),
+    ("order lookup by order_id", "orders", {"order_id": "00000000"}, None, 1),
+    ("admin order search by order_id prefix", "orders", {"order_id": {"$regex": "^01HX"}}, [("order_id", ASCENDING)], 20),
+    (
+        "archive_orders batch", "orders",
+        {"status": {"$in": ["delivered", "cancelled"]}, "created_at": {"$lt": datetime(2025, 1, 1)}},
+        [("created_at", ASCENDING)], 500,
+    ),
+    ("admin order listing with archive", "orders_archive", {}, [("created_at", DESCENDING)], 20),
+    ("ProfileForAccountView address", "user_address", {"user_id": "000000000000000000000000"}, None, 1),
+    ("admin product listing", "products", {}, [("name", ASCENDING)], 20),
+    ("outbox poller", "outbox", {"state": "pending", "next_attempt_at": {"$lte": datetime(2025, 1, 1)}}, [("next_attempt_at", ASCENDING)], 1),
+    ("products_public delta sync", "catalog_changes", {"version": {"$gt": 0}}, [("version", ASCENDING)], 0),
+]
+
+
+def ensure_indexes(db, log=print):
+    """Create all declared indexes; returns a list of error strings."""
+    errors = []
+    for collection, models in INDEXES.items():
+        try:
+            names = db[collection].create_indexes(models)
+            log(f"{collection}: {', '.join(names)}")
+        except OperationFailure as exc:
+            errors.append(f"{collection}: {exc}")
+    return errors
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+def verify_hot_queries(db, log=print):
+    """Explain each hot query; returns descriptions of those that scan."""
+    failures = []
+    for description, collection, query, sort, limit in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = set(_plan_stages(plan))
+        if "COLLSCAN" in stages:
+            failures.append(f"{description} ({collection}): COLLSCAN")
+            log(f"FAIL {description}: {sorted(stages)}")
+        else:
+            log(f"ok   {description}: {sorted(stages)}")
+    return failures
@@ -8,6 +8,7 @@ from django.conf import settings
 from datetime import datetime
 from utils.password import verify_password, hash_password
 from bson import ObjectId
+from utils.token_cache import verified_tokens, SNAPSHOT_PROJECTION
 import traceback
 
 
@@ -19,17 +20,24 @@ class CustomJWTAuthentication(BaseAuthentication):
         
         try:
             token = auth_header.split(' ')[1]
+            cached = verified_tokens.get(token)
+            if cached:
+                return cached
+
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            if payload.get('type') != 'access':
+                return None
             user_id = payload.get('user_id')
             
             if not user_id: 
                 return None  
-            user = users_col.find_one({"_id": ObjectId(str(user_id))})
+            user = users_col.find_one({"_id": ObjectId(str(user_id))}, SNAPSHOT_PROJECTION)
             if not user: 
                 return None
             
             user_dict = dict(user)
             user_dict['id'] = str(user_id)
+            verified_tokens.set(token, user_id, user_dict, payload)
             return (user_dict, payload)
             
         except jwt.ExpiredSignatureError:
@@ -1,15 +1,18 @@
 import jwt
 from django.conf import settings
 
-def decode_token(token: str):
+def decode_token(token: str, expected_type: str = "access"):
     try:
         payload = jwt.decode(
             token,
             settings.SECRET_KEY,
             algorithms=["HS256"]
         )
-        return payload
     except jwt.ExpiredSignatureError:
         raise Exception("Token expired")
     except jwt.InvalidTokenError:
         raise Exception("Invalid token")
+    # Refresh tokens (and anything else signed with SECRET_KEY) are not bearer credentials.
+    if payload.get("type") != expected_type:
+        raise Exception("Invalid token")
+    return payload
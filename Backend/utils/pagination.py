@@ -0,0 +1,149 @@
+"""Keyset (cursor) pagination over Mongo collections.
+
+A page is fetched by sorting on (field, _id) and continuing strictly after
+the last document of the previous page. Page 200 therefore costs the same
+indexed walk as page 1, unlike skip(). The cursor handed to clients is the
+last document's (field value, _id) pair, serialized with bson.json_util so
+datetimes and ObjectIds survive the round trip, then base64-encoded to
+keep it opaque. A "prev" cursor holds the first document of a page and
+walks the other way.
+
+Collections paged this way need an index ending in (field, _id) in the sort
+direction, after any equality fields of the query.
+
+slice_window() does the same over an already sorted in-memory list of keys.
+The admin product listing uses it with the ids from the search index.
+"""
+
+import base64
+import binascii
+import bisect
+import json
+from datetime import datetime
+
+from bson import ObjectId, json_util
+from pymongo import ASCENDING, DESCENDING
+
+
+def encode_cursor(value, doc_id, backward=False):
+    payload = [value, doc_id, 1] if backward else [value, doc_id]
+    raw = json_util.dumps(payload, json_options=json_util.CANONICAL_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+# Sort values a cursor may carry. Anything else, e.g. a crafted {"$gt": ...}
+# dict, would turn into an operator inside after_cursor()'s equality branch.
+CURSOR_SCALARS = (str, int, float, bool, datetime, ObjectId, type(None))
+
+
+def _cursor_value(value):
+    if isinstance(value, list):
+        # slice_window() keys are tuples of scalars.
+        if all(isinstance(part, CURSOR_SCALARS) for part in value):
+            return value
+        raise ValueError
+    if not isinstance(value, CURSOR_SCALARS):
+        raise ValueError
+    return value
+
+
+def decode_cursor(cursor):
+    """(value, _id, backward) from a cursor; raises ValueError if it was tampered with."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        if not isinstance(payload, list) or len(payload) not in (2, 3):
+            raise ValueError
+        return _cursor_value(payload[0]), _cursor_value(payload[1]), len(payload) == 3
+    except (binascii.Error, UnicodeError, json.JSONDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def after_cursor(field, value, doc_id, descending=True):
+    """Filter for documents strictly after (value, doc_id) in sort order."""
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: doc_id}},
+    ]}
+
+
+def collection_finder(collection, max_time_ms=None):
+    """find(query, projection, field, descending, limit) over one collection."""
+    def find(query, projection, field, descending, limit):
+        direction = DESCENDING if descending else ASCENDING
+        cursor = collection.find(query, projection).sort([(field, direction), ("_id", direction)]).limit(limit)
+        if max_time_ms:
+            cursor = cursor.max_time_ms(max_time_ms)
+        return list(cursor)
+    return find
+
+
+def keyset_window(collection, query, field, limit, cursor=None, projection=None,
+                  descending=True, max_time_ms=None, find=None):
+    """One page plus "next" and "prev" cursors (None where there is no page).
+
+    `find` replaces the single-collection fetch, e.g. to merge two
+    collections; it gets (query, projection, field, descending, limit).
+    """
+    find = find or collection_finder(collection, max_time_ms)
+    backward = False
+    if cursor:
+        value, doc_id, backward = decode_cursor(cursor)
+        # A backward page walks the sort the other way from the page's first row.
+        after = after_cursor(field, value, doc_id, descending != backward)
+        query = {"$and": [query, after]} if query else after
+
+    docs = find(query, projection, field, descending != backward, limit + 1)
+    more = len(docs) > limit
+    docs = docs[:limit]
+    if backward:
+        docs.reverse()
+
+    def cursor_for(doc, back=False):
+        return encode_cursor(doc.get(field), doc["_id"], back)
+
+    # Walking back, `more` means more rows before this page, and a later
+    # page always exists (we came from it).
+    has_next = True if backward else more
+    has_prev = more if backward else bool(cursor)
+
+    next_cursor = prev_cursor = None
+    if docs:
+        if has_next:
+            next_cursor = cursor_for(docs[-1])
+        if has_prev:
+            prev_cursor = cursor_for(docs[0], back=True)
+    return docs, next_cursor, prev_cursor
+
+
+def slice_window(keys, limit, cursor=None):
+    """(start, end, next, prev) for a page of an ascending list of key tuples."""
+    start, end = 0, min(limit, len(keys))
+    if cursor:
+        value, _, backward = decode_cursor(cursor)
+        key = tuple(value) if isinstance(value, list) else (value,)
+        if backward:
+            end = bisect.bisect_left(keys, key)
+            start = max(0, end - limit)
+        else:
+            start = bisect.bisect_right(keys, key)
+            end = min(start + limit, len(keys))
+
+    next_cursor = encode_cursor(list(keys[end - 1]), None) if end < len(keys) and end > start else None
+    prev_cursor = encode_cursor(list(keys[start]), None, backward=True) if start > 0 and end > start else None
+    return start, end, next_cursor, prev_cursor
+
+
+def cursor_mode(request):
+    """Admin lists switch to keyset paging with ?pagination=cursor or a cursor."""
+    params = request.query_params
+    return params.get("pagination") == "cursor" or "cursor" in params
+
+
+def page_limit(raw, default=20, maximum=100):
+    """Clamp a client-supplied page size."""
+    try:
+        return max(1, min(int(raw), maximum))
+    except (TypeError, ValueError):
+        return default
@@ -1,7 +1,287 @@
+"""bcrypt helpers backed by a bounded process pool.
+
+Hashing is CPU bound, so it runs in PASSWORD_HASH_WORKERS child processes
+instead of on the WSGI worker thread. At most PASSWORD_HASH_MAX_QUEUE calls
+may wait for a free worker; beyond that callers get PasswordHashingBusy
+straight away and the views answer 503. Set PASSWORD_HASH_WORKERS to 0 to
+hash inline (local development, tests).
+
+The bcrypt cost is shared by every worker on the same kind of machine.
+Unless PASSWORD_HASH_ROUNDS pins it, the first worker to need it runs
+calibrate_rounds(), which times a cheap hash on the pool and extrapolates to
+the largest cost that stays within PASSWORD_HASH_BUDGET_MS (clamped to the
+MIN/MAX settings), and stores the result in counters under
+"password_hash_rounds:<host signature>" together with those settings. The
+signature is the CPU architecture, model and count, so identical hosts share
+one value; new hardware, or a changed budget or MIN/MAX, recalibrates. Logins rehash stored passwords whose cost is below the target,
+or more than one above it, via needs_rehash().
+"""
+
+import hashlib
+import logging
+import os
+import platform
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
 import bcrypt
+from django.conf import settings
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from mongo.collections import counters_col
+
+
+DEFAULT_ROUNDS = 12
+CALIBRATION_ROUNDS = 8
+CALIBRATION_SAMPLES = 3
+ROUNDS_ID = "password_hash_rounds"
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503."""
+
+
+def _hash_job(password, rounds, submitted_at):
+    started_at = time.time()
+    start = time.perf_counter()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+    return hashed, started_at - submitted_at, time.perf_counter() - start
+
+
+def _time_job(rounds, submitted_at):
+    started_at = time.time()
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+    elapsed = time.perf_counter() - start
+    return elapsed, started_at - submitted_at, elapsed
+
+
+def _check_job(password, hashed, submitted_at):
+    started_at = time.time()
+    start = time.perf_counter()
+    ok = bcrypt.checkpw(password, hashed)
+    return ok, started_at - submitted_at, time.perf_counter() - start
+
+
+class HashingStats:
+    """Queue-time and hash-time counters published by hashing_stats()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+        self.hash_time_total = 0.0
+        self.hash_time_max = 0.0
+
+    def record(self, queue_time, hash_time):
+        with self._lock:
+            self.completed += 1
+            self.queue_time_total += queue_time
+            self.queue_time_max = max(self.queue_time_max, queue_time)
+            self.hash_time_total += hash_time
+            self.hash_time_max = max(self.hash_time_max, hash_time)
+
+    def count(self, field, delta=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def snapshot(self):
+        with self._lock:
+            done = self.completed or 1
+            return {
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "in_flight": self.in_flight,
+                "queue_ms_avg": round(self.queue_time_total / done * 1000, 2),
+                "queue_ms_max": round(self.queue_time_max * 1000, 2),
+                "hash_ms_avg": round(self.hash_time_total / done * 1000, 2),
+                "hash_ms_max": round(self.hash_time_max * 1000, 2),
+            }
+
+
+class HashingExecutor:
+    def __init__(self, workers, max_queue, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.stats = HashingStats()
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + max_queue)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _reset_pool(self, pool):
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def run(self, job, *args):
+        if not self._slots.acquire(blocking=False):
+            self.stats.count("rejected")
+            raise PasswordHashingBusy("Password hashing queue is full")
+
+        self.stats.count("in_flight")
+        try:
+            if self.workers <= 0:
+                result, queue_time, hash_time = job(*args, time.time())
+            else:
+                pool = self._get_pool()
+                try:
+                    future = pool.submit(job, *args, time.time())
+                    result, queue_time, hash_time = future.result(timeout=self.timeout)
+                except BrokenProcessPool:
+                    self._reset_pool(pool)
+                    self.stats.count("failed")
+                    raise PasswordHashingBusy("Password hashing pool restarted")
+                except FutureTimeout:
+                    self.stats.count("failed")
+                    raise PasswordHashingBusy("Password hashing timed out")
+            self.stats.record(queue_time, hash_time)
+            return result
+        finally:
+            self.stats.count("in_flight", -1)
+            self._slots.release()
+
+
+executor = HashingExecutor(
+    workers=getattr(settings, "PASSWORD_HASH_WORKERS", 2),
+    max_queue=getattr(settings, "PASSWORD_HASH_MAX_QUEUE", 32),
+    timeout=getattr(settings, "PASSWORD_HASH_TIMEOUT_SECONDS", 10),
+)
+
+
+_target_rounds = None
+_target_lock = threading.Lock()
+
+
+def calibrate_rounds(budget_ms=None) -> int:
+    """Largest cost whose hash time on this host fits within budget_ms."""
+    if budget_ms is None:
+        budget_ms = getattr(settings, "PASSWORD_HASH_BUDGET_MS", 250)
+    min_rounds = getattr(settings, "PASSWORD_HASH_MIN_ROUNDS", 10)
+    max_rounds = getattr(settings, "PASSWORD_HASH_MAX_ROUNDS", 15)
+
+    sample = min(
+        executor.run(_time_job, CALIBRATION_ROUNDS)
+        for _ in range(CALIBRATION_SAMPLES)
+    )
+    rounds = min_rounds
+    # Each extra round doubles the work, so extrapolate from the sample.
+    while rounds < max_rounds and sample * 2 ** (rounds + 1 - CALIBRATION_ROUNDS) * 1000 <= budget_ms:
+        rounds += 1
+    return rounds
+
+
+def _host_signature():
+    """CPU architecture, model and count; hosts that hash alike share it."""
+    model = ""
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("model name"):
+                    model = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{platform.machine()}|{model or platform.processor()}|{os.cpu_count()}"
+
+
+def _shared_rounds() -> int:
+    """The calibrated cost for this kind of host and the current settings.
+
+    The first worker to calibrate for a (signature, settings) pair wins;
+    a stored value for other settings is recalibrated and replaced.
+    """
+    config = {
+        "budget_ms": getattr(settings, "PASSWORD_HASH_BUDGET_MS", 250),
+        "min_rounds": getattr(settings, "PASSWORD_HASH_MIN_ROUNDS", 10),
+        "max_rounds": getattr(settings, "PASSWORD_HASH_MAX_ROUNDS", 15),
+    }
+    signature = _host_signature()
+    doc_id = f"{ROUNDS_ID}:{hashlib.sha1(signature.encode()).hexdigest()[:12]}"
+
+    stored = counters_col.find_one({"_id": doc_id})
+    if stored is not None and stored.get("config") == config:
+        return stored["rounds"]
+
+    rounds = calibrate_rounds(config["budget_ms"])
+    try:
+        stored = counters_col.find_one_and_update(
+            {"_id": doc_id, "config": {"$ne": config}},
+            {"$set": {"rounds": rounds, "config": config, "signature": signature}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Another worker stored a value for these settings first; use it.
+        stored = counters_col.find_one({"_id": doc_id})
+    return stored["rounds"]
+
+
+def target_rounds() -> int:
+    """PASSWORD_HASH_ROUNDS if set, otherwise the shared calibrated cost (cached)."""
+    global _target_rounds
+    if _target_rounds is None:
+        with _target_lock:
+            if _target_rounds is None:
+                configured = getattr(settings, "PASSWORD_HASH_ROUNDS", 0)
+                _target_rounds = configured if configured > 0 else _shared_rounds()
+                logger.info("Password hashing cost set to %s", _target_rounds)
+    return _target_rounds
+
+
+def hash_rounds(hashed):
+    """Cost factor of a bcrypt hash, or None if it is not a bcrypt hash."""
+    if isinstance(hashed, bytes):
+        hashed = hashed.decode("utf-8", "ignore")
+    if not isinstance(hashed, str) or not hashed.startswith("$2"):
+        return None
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed) -> bool:
+    """True for non-bcrypt values, weaker hashes, and hashes well above the target.
+
+    A one-round slack above the target keeps a lowered cost from rehashing
+    every login while still letting an over-expensive cost come down.
+    """
+    rounds = hash_rounds(hashed)
+    if rounds is None:
+        return True
+    target = target_rounds()
+    return rounds < target or rounds > target + 1
+
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return executor.run(_hash_job, password.encode(), target_rounds()).decode()
+
+def verify_password(password: str, hashed) -> bool:
+    if isinstance(hashed, str):
+        hashed = hashed.encode()
+    return executor.run(_check_job, password.encode(), hashed)
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode(), hashed.encode())
+def hashing_stats() -> dict:
+    stats = executor.stats.snapshot()
+    stats["rounds"] = _target_rounds
+    return stats
@@ -0,0 +1,66 @@
+"""Signed, short-lived order quotes.
+
+order_quote hands the computed quote back as a JWT of type "quote" bound to
+the user. create_order verifies the signature and reuses the quote instead of
+loading the user and re-pricing the cart. The points balance is still checked
+atomically when the coins are spent. A token is only valid for
+QUOTE_TOKEN_TTL_SECONDS, so catalog price changes reach checkout quickly.
+
+Quote tokens must never pass as bearer credentials. They are signed with a
+key derived from SECRET_KEY for this purpose only (or QUOTE_TOKEN_SECRET when
+set) and carry their own audience, so the access-token decoders reject them
+on the signature alone; those decoders also insist on type "access".
+"""
+
+import hashlib
+import hmac
+from datetime import datetime, timedelta
+
+import jwt
+from django.conf import settings
+
+
+TOKEN_TYPE = "quote"
+AUDIENCE = "order-quote"
+
+
+def _signing_key():
+    configured = getattr(settings, "QUOTE_TOKEN_SECRET", "")
+    if configured:
+        return configured
+    return hmac.new(settings.SECRET_KEY.encode(), b"order-quote-token", hashlib.sha256).hexdigest()
+
+
+def quote_token_ttl():
+    return timedelta(seconds=getattr(settings, "QUOTE_TOKEN_TTL_SECONDS", 600))
+
+
+def issue_quote_token(user_id, quote, name=None):
+    now = datetime.utcnow()
+    payload = {
+        "user_id": str(user_id),
+        "name": name,
+        "type": TOKEN_TYPE,
+        "aud": AUDIENCE,
+        "quote": quote,
+        "exp": now + quote_token_ttl(),
+        "iat": now,
+    }
+    return jwt.encode(payload, _signing_key(), algorithm="HS256")
+
+
+def verify_quote_token(token, user_id):
+    """(quote, user name) carried by `token`; raises ValueError if it cannot be used."""
+    try:
+        payload = jwt.decode(token, _signing_key(), algorithms=["HS256"], audience=AUDIENCE)
+    except jwt.ExpiredSignatureError:
+        raise ValueError("Quote expired, please review your cart again")
+    except jwt.InvalidTokenError:
+        raise ValueError("Invalid quote token")
+
+    if payload.get("type") != TOKEN_TYPE or payload.get("user_id") != str(user_id):
+        raise ValueError("Invalid quote token")
+    quote = payload.get("quote")
+    if not isinstance(quote, dict) or not quote.get("normalized_items"):
+        raise ValueError("Invalid quote token")
+    return quote, payload.get("name")
@@ -0,0 +1,72 @@
+"""Request-scoped identity for the bearer-token user endpoints.
+
+The JWT is decoded at most once and the user document is loaded at most once
+per request; every RouterFunctions helper receives the same RequestIdentity
+instead of re-parsing the Authorization header.
+"""
+
+from bson import ObjectId
+
+from mongo.collections import users_col
+from utils.jwt_helper import decode_token
+
+
+# Fields the user-facing handlers read from the user document.
+USER_PROJECTION = {
+    "name": 1,
+    "phone": 1,
+    "email": 1,
+    "points": 1,
+    "referral_code": 1,
+}
+
+
+class RequestIdentity:
+    def __init__(self, auth_header):
+        self.auth_header = auth_header or ""
+        self._payload = None
+        self._user = None
+        self._user_loaded = False
+
+    @property
+    def has_bearer(self):
+        return self.auth_header.startswith("Bearer ")
+
+    @property
+    def payload(self):
+        """Decoded JWT payload; raises the same errors as decode_token."""
+        if self._payload is None:
+            if not self.has_bearer:
+                raise Exception("Token required")
+            self._payload = decode_token(self.auth_header.split(" ")[1])
+        return self._payload
+
+    @property
+    def user_id(self):
+        return self.payload.get("user_id")
+
+    @property
+    def user(self):
+        """User document (USER_PROJECTION fields) or None if it does not exist."""
+        if not self._user_loaded:
+            user_id = self.user_id
+            self._user = (
+                users_col.find_one({"_id": ObjectId(user_id)}, USER_PROJECTION)
+                if user_id else None
+            )
+            self._user_loaded = True
+        return self._user
+
+    def set_points(self, points):
+        """Keep the loaded snapshot in step after a points write."""
+        if self._user is not None:
+            self._user["points"] = points
+
+
+def get_identity(request):
+    """Return the identity for this request, creating it on first use."""
+    identity = getattr(request, "_request_identity", None)
+    if identity is None:
+        identity = RequestIdentity(request.headers.get("Authorization"))
+        request._request_identity = identity
+    return identity
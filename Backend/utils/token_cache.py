@@ -0,0 +1,93 @@
+"""Process-local cache of verified access tokens.
+
+Maps a raw bearer token to the user snapshot that CustomJWTAuthentication
+resolved for it, so repeat requests with the same token skip jwt.decode and
+the users_col lookup. Entries live until the token's own `exp`, capped by
+TOKEN_CACHE_MAX_TTL_SECONDS so changes made by another worker are picked up
+within that window. Writes that change a user call invalidate_user_tokens().
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+# Fields copied into the cached snapshot; never keep the password hash around.
+SNAPSHOT_PROJECTION = {"password": 0}
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of token -> (user snapshot, payload) with per-entry TTL."""
+
+    def __init__(self, max_entries=10000, max_ttl=300):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()
+        self._tokens_by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user_id, user, payload, expires_at = entry
+            if expires_at <= now:
+                self._drop(token)
+                return None
+            self._entries.move_to_end(token)
+            return dict(user), payload
+
+    def set(self, token, user_id, user, payload):
+        now = time.time()
+        exp = payload.get("exp")
+        expires_at = now + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+
+        user_id = str(user_id)
+        with self._lock:
+            if token in self._entries:
+                self._drop(token)
+            self._entries[token] = (user_id, dict(user), payload, expires_at)
+            self._tokens_by_user.setdefault(user_id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token in self._tokens_by_user.pop(str(user_id), set()):
+                self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _drop(self, token):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[0])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[0]]
+
+
+verified_tokens = VerifiedTokenCache(
+    max_entries=getattr(settings, "TOKEN_CACHE_MAX_ENTRIES", 10000),
+    max_ttl=getattr(settings, "TOKEN_CACHE_MAX_TTL_SECONDS", 300),
+)
+
+
+def invalidate_user_tokens(user_id):
+    """Evict every cached token for a user after their document changes."""
+    if user_id:
+        verified_tokens.invalidate_user(user_id)